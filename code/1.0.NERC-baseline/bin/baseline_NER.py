@@ -2,10 +2,12 @@
 
 import os, sys
 import json
-from xml.dom.minidom import parse
-import spacy
 
+import paths
+import corpus
+from analysis_cache import AnalysisCache
 from drug_index import *
+from drug_matcher import DrugMatcher
 
 ## --------- Entity extractor ----------- 
 ## -- Extract drug entities from given text and return them as
@@ -13,46 +15,49 @@ from drug_index import *
 
 def extract_entities(stext, tokens, index) :
     result = []
-    i = 0
-    while i < len(tokens) :
-        # check if a drug name starts at position i
-        drug_type, end = index.find_drug(tokens, i)
-
-        if drug_type is not None :
-            entity_start = tokens[i].idx
-            entity_end = tokens[end].idx + len(tokens[end].text)
-            e = { "offset" : str(entity_start)+"-"+str(entity_end-1),
-                  "text" : stext[entity_start:entity_end],
-                  "type" : drug_type
-                 }
-            result.append(e)
-            i = end
-        
-        i += 1
+    for start, end, drug_type in index.match_all([t.text for t in tokens]) :
+        entity_start = tokens[start].idx
+        entity_end = tokens[end].idx + len(tokens[end].text)
+        e = { "offset" : str(entity_start)+"-"+str(entity_end-1),
+              "text" : stext[entity_start:entity_end],
+              "type" : drug_type
+             }
+        result.append(e)
 
     return result
       
 ## --------- Entity extractor baseline ----------- 
-def NER_baseline(datafile, drugindex, outfile) :
+def NER_baseline(datafile, drugindex, outfile, batch_size=64, n_process=1, fast=False) :
     outf = open(outfile, "w")
     
     index = DrugIndex(drugindex)
 
-    # create tokenizer
-    nlp = spacy.load("en_core_web_trf", enable=["tokenizer"])
-
-    # parse XML file, obtaining a DOM tree
-    tree = parse(datafile)
+    if fast :
+        # match names directly on sentence text, no tokenizer needed
+        matcher = DrugMatcher(index)
+        for s in corpus.sentences(datafile) :
+            stext = s["text"]
+            for start, end, drug_type in matcher.match_all(stext) :
+                print(s["id"],
+                      str(start)+"-"+str(end-1),
+                      stext[start:end],
+                      drug_type,
+                      sep = "|",
+                      file = outf)
+        outf.close()
+        return
 
-    # process each sentence in the file
-    sentences = tree.getElementsByTagName("sentence")
-    for s in sentences :
-        sid = s.attributes["id"].value   # get sentence id
-        stext = s.attributes["text"].value   # get sentence text
+    # create tokenizer
+    nlp = AnalysisCache("en_core_web_trf", enable=["tokenizer"])
+
+    # process each sentence in the file, tokenizing texts in batches
+    # and keeping each sentence record attached to its tokens
+    sentences = ((s["text"], s) for s in corpus.sentences(datafile))
+    for tokens, s in nlp.pipe(sentences, batch_size=batch_size, n_process=n_process) :
+        sid = s["id"]   # get sentence id
+        stext = s["text"]   # get sentence text
         print(f"processing sentence {sid}        \r", end="")
 
-        # tokenize text with spacy tokenizer
-        tokens = nlp(stext)
         # extract entities in text
         entities = extract_entities(stext, tokens, index)
 
@@ -66,18 +71,21 @@ def NER_baseline(datafile, drugindex, outfile) :
                   file = outf)
 
     outf.close()
+    nlp.save()
 
 
 ## --------- MAIN PROGRAM ----------- 
 ## --
-## -- Usage:  baseline-NER.py target-dir drug_index
+## -- Usage:  baseline-NER.py datafile drug_index result.out [fast]
 ## --
-## -- Extracts Drug NE from all XML files in target-dir
+## -- Extracts Drug NE from all sentences in datafile.
+## -- If "fast" is given, names are matched directly on sentence
+## -- text, without tokenizing it.
 ## --
 
 if __name__ == "__main__" :
-   if len(sys.argv) != 4 :
-       print(f"usage:  {os.path.basename(__file__)} datafile drug_index  result.out")
+   if len(sys.argv) not in [4,5] :
+       print(f"usage:  {os.path.basename(__file__)} datafile drug_index  result.out [fast]")
        sys.exit(0)
 
    datafile = sys.argv[1]
@@ -85,7 +93,7 @@ if __name__ == "__main__" :
    outfile = sys.argv[3]
 
    # load previously created index
-   NER_baseline(datafile, drugidx, outfile)
+   NER_baseline(datafile, drugidx, outfile, fast="fast" in sys.argv[4:])
 
 
 
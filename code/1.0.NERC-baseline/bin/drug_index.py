@@ -2,87 +2,40 @@
 import os, sys
 import json
 
+import paths
+from token_trie import TokenTrie
+from lexicon import Lexicon
+
+# ------------------------------------------
+# Token-level prefix tree with all known drug names (see util/token_trie.py),
+# built from the shared resources lexicon (see util/lexicon.py).
 # ------------------------------------------
-class DrugIndex() :
+class DrugIndex(TokenTrie) :
     def __init__(self, filename=None, resources=None) :
-        
-        if filename is not None:
-            with open(filename) as f :
-                self.tree = json.load(f)
-
-        elif resources is not None :
-            self.tree = {}
-            print("Collecting drugs from HSDB")
-            with open(os.path.join(resources,"HSDB.txt")) as h :
-                n = 0
-                for x in h.readlines() :
-                    tks = x.strip().lower().split()
-                    self.add_drug(self.tree, tks, "drug")
-                    n += 1
-                    if n%11==0 : print(f"{n} lines processed.        \r", end="")
-
-            print("Collecting drugs from DrugBank")
-            with open(os.path.join(resources,"DrugBank.txt")) as h :
-                for x in h.readlines() :
-                    (n,t) = x.strip().lower().split("|")
-                    tks = n.split()
-                    self.add_drug(self.tree, tks, t)
-
-            print("Collecting drugs from drugs-train")
-            with open(os.path.join(resources,"drugs-train.txt")) as h :
-                for x in h.readlines() :
-                    (_,_,n,t) = x.strip().lower().split("|")
-                    tks = n.split()
-                    self.add_drug(self.tree, tks, t)
-        else :
-            print("Error: either a filename or a resources file was expected")
-            sys.exit(1)
 
+        if filename is not None and filename.endswith(".json") :
+            # old-style index, with the tree dumped as nested dictionaries
+            with open(filename) as f :
+                self.compile(json.load(f))
 
-    # ------------------------------------------
-    def add_drug(self, node, tks, kind) :
-        if tks[0] not in node :
-            node[tks[0]] = {}
+        elif filename is not None :
+            self.load(filename)
 
-        if len(tks)==1 :
-            node[tks[0]]["END"] = kind
         else :
-            self.add_drug(node[tks[0]], tks[1:], kind)
-
-    # ------------------------------------------
-    def search_drug(self, tree, tks, i) :
-        
-        if tks[i] in tree :
-            kind = None
-            if i<len(tks)-1 :
-                kind, end = self.search_drug(tree[tks[i]], tks, i+1)
-                
-            if kind is not None :
-                return kind, end
-            elif "END" in tree[tks[i]] :
-                return tree[tks[i]]["END"], i
-
-        # not in tree, or "END" not found for given fragment
-        return None, 0
+            # compiled index from resources lexicon, built only if
+            # resource files changed since last time
+            lex = Lexicon(resources=resources or paths.RESOURCES)
+            self.load(lex.trie_file())
 
     # ------------------------------------------
     def find_drug(self, tks, i) :
-        return self.search_drug(self.tree, [t.text.lower() for t in tks], i)
+        return self.search_drug([t.text for t in tks], i)
+
 
-    # ------------------------------------------
-    def dump(self, file=sys.stdout) :
-        json.dump(self.tree, file, indent=3, ensure_ascii=False)
-        
-        
-             
 if __name__ == "__main__" :
 
     outfile = sys.argv[1]
 
-    # create a new index and dump it to file
-    import paths
+    # create a new index and save it to file
     drugs = DrugIndex(resources=paths.RESOURCES)
-    with open(outfile, "w") as of:
-       drugs.dump(file=of)
-      
-      
+    drugs.save(outfile)
@@ -0,0 +1,125 @@
+
+import sys
+from array import array
+
+import paths
+from drug_index import DrugIndex
+
+# ------------------------------------------
+# Character-level Aho-Corasick automaton over all drug names in a DrugIndex.
+#
+# Names are the index token sequences joined with single spaces, and are
+# searched directly in the lowercased sentence text, so no tokenizer is
+# needed. A match is accepted only if it starts and ends at a word boundary
+# (i.e. it is not preceded nor followed by a letter or digit), which
+# approximates the token boundaries DrugIndex relies on.
+#
+# The automaton is stored as:
+#   - goto: dictionary (state << 21 | character code) -> next state
+#           (21 bits hold any unicode code point). State 0 is the root.
+#   - fail[s]: state for the longest proper suffix of s that is a prefix
+#              of some name
+#   - depth[s]: length of the string leading to state s
+#   - out[s]: index in self.kinds of the name ending at s, or -1
+#   - link[s]: next state in the fail chain of s with an output, or 0
+# ------------------------------------------
+class DrugMatcher() :
+    def __init__(self, index) :
+        self.kinds = list(index.kinds)
+        kind_id = {k:i for i,k in enumerate(self.kinds)}
+
+        # build the trie of characters
+        goto = {}
+        depth = [0]
+        out = [-1]
+        parent = [0]
+        char = [0]
+        for tks, kind in index.names() :
+            s = 0
+            for c in " ".join(tks) :
+                key = (s << 21) | ord(c)
+                t = goto.get(key)
+                if t is None :
+                    t = len(depth)
+                    goto[key] = t
+                    depth.append(depth[s]+1)
+                    out.append(-1)
+                    parent.append(s)
+                    char.append(ord(c))
+                s = t
+            out[s] = kind_id[kind]
+
+        # compute failure and output links, in breadth-first order
+        fail = [0]*len(depth)
+        link = [0]*len(depth)
+        for t in sorted(range(1, len(depth)), key=depth.__getitem__) :
+            p = parent[t]
+            if p != 0 :
+                f = fail[p]
+                while f and ((f << 21) | char[t]) not in goto :
+                    f = fail[f]
+                fail[t] = goto.get((f << 21) | char[t], 0)
+            f = fail[t]
+            link[t] = f if out[f] >= 0 else link[f]
+
+        self.goto = goto
+        self.fail = array("i", fail)
+        self.link = array("i", link)
+        self.depth = array("i", depth)
+        self.out = array("b", out)
+
+    # ------------------------------------------
+    # find all leftmost-longest drug names in given text, with word
+    # boundaries at both ends. Returns a list of (start, end, type)
+    # tuples, with 'end' the position after the last character.
+    def match_all(self, text) :
+        low = text.lower()
+        if len(low) != len(text) :
+            # some characters expand when lowercased, keep offsets aligned
+            low = "".join(c.lower()[0] for c in text)
+
+        goto, fail, link, depth, out = self.goto, self.fail, self.link, self.depth, self.out
+        found = []
+        s = 0
+        for i,c in enumerate(map(ord, low)) :
+            t = goto.get((s << 21) | c)
+            while t is None and s :
+                s = fail[s]
+                t = goto.get((s << 21) | c)
+            s = t or 0
+
+            # report all names ending at position i
+            t = s if out[s] >= 0 else link[s]
+            while t :
+                start, end = i+1-depth[t], i+1
+                if (start == 0 or not text[start-1].isalnum()) and \
+                   (end == len(text) or not text[end].isalnum()) :
+                    found.append((start, end, out[t]))
+                t = link[t]
+
+        # keep leftmost-longest non overlapping matches
+        found.sort(key=lambda m : (m[0], -m[1]))
+        matches = []
+        last = 0
+        for start, end, kind in found :
+            if start >= last :
+                matches.append((start, end, self.kinds[kind]))
+                last = end
+        return matches
+
+
+
+## --------- MAIN PROGRAM -----------
+## --
+## -- Usage:  drug_matcher.py drug_index
+## --
+## -- Reads sentences from stdin, and prints drug names found in each
+## -- of them, as start-end|text|type
+## --
+
+if __name__ == "__main__" :
+    matcher = DrugMatcher(DrugIndex(sys.argv[1]))
+    for line in sys.stdin :
+        line = line.rstrip("\n")
+        for start, end, kind in matcher.match_all(line) :
+            print(f"{start}-{end-1}", line[start:end], kind, sep="|")
@@ -8,14 +8,27 @@ import paths
 from gold_extractor import GoldExtractor
 from evaluator import evaluate
 
+# extract spaCy batching parameters from command line.
+#   e.g.  python3 run.py nlp_batch_size=128 nlp_n_process=4
+# or request matching names on raw text, without spaCy
+#   e.g.  python3 run.py fast
+params = {}
+for p in sys.argv[1:]:
+    if "=" in p:
+        par,val = p.split("=")
+        params[par] = val
+batch_size = int(params.get("nlp_batch_size", 64))
+n_process = int(params.get("nlp_n_process", 1))
+fast = "fast" in sys.argv[1:]
+
 # if feature extraction is required, do it
 print("Extracting drugs from train data")
 gold = GoldExtractor(os.path.join(paths.DATA,"train.xml"))
 gold.extract_NER(os.path.join(paths.RESOURCES,"drugs-train.txt"))
 print("Creating prefix-tree index with all known drug names")
 idx = DrugIndex(resources=paths.RESOURCES)    
-idxfile = os.path.join(paths.RESOURCES,"drug-index.json")
-with open(idxfile,"w") as jf: idx.dump(file=jf)
+idxfile = os.path.join(paths.RESOURCES,"drug-index.bin")
+idx.save(idxfile)
 
 print("Applying index to predict drugs")
 os.makedirs(paths.RESULTS, exist_ok=True)
@@ -23,7 +36,8 @@ for ds in ["devel", "test"]:
    print(f"Running baseline on {ds}                   ")
    NER_baseline(os.path.join(paths.DATA,f"{ds}.xml"), 
                 idxfile, 
-                os.path.join(paths.RESULTS,f"{ds}.out"))
+                os.path.join(paths.RESULTS,f"{ds}.out"),
+                batch_size, n_process, fast)
    print(f"Evaluating baseline on {ds}                ")
    evaluate("NER",
             os.path.join(paths.DATA,f"{ds}.xml"),
@@ -2,19 +2,78 @@
 ## Class to store an ngram ME model
 #####################################################
 
-import sys
+import sys, os
+import multiprocessing
 import pycrfsuite
 from dataset import *
 
 
+## --------------------------------------------------
+## raised to stop training when holdout F1 stops improving
+## --------------------------------------------------
+class StopTraining(Exception) :
+    pass
+
+## --------------------------------------------------
+## Trainer evaluating the model on holdout sentences after each
+## iteration, and stopping when F1 on entity labels (B-/I-, as decoded
+## by crfsuite) has not improved for 'patience' iterations
+## --------------------------------------------------
+class HoldoutTrainer(pycrfsuite.Trainer) :
+
+    def __init__(self, algorithm, params, patience) :
+        super().__init__(algorithm, params)
+        self.patience = patience
+        self.best_f1 = -1
+        self.best_iteration = 0
+        self.last_iteration = 0
+
+    def on_iteration(self, log, info) :
+        # micro averaged F1 over all labels but O
+        match = model = ref = 0
+        for label, sc in info["scores"].items() :
+            if label == "O" : continue
+            match, model, ref = match+sc.match, model+sc.model, ref+sc.ref
+        f1 = 2*match/(model+ref) if model+ref > 0 else 0
+        print(f"Iteration {info['num']}: loss={info['loss']:.2f} holdout F1={f1:.4f}")
+        self.last_iteration = info["num"]
+
+        if f1 > self.best_f1 :
+            self.best_f1, self.best_iteration = f1, info["num"]
+        elif info["num"] - self.best_iteration >= self.patience :
+            raise StopTraining()
+
+
+## --------------------------------------------------
+## auxiliary for parallel tagging: each worker process opens
+## the model once, and then tags chunks of sentences
+## --------------------------------------------------
+_tagger = None
+
+def _open_tagger(modelfile) :
+    global _tagger
+    _tagger = pycrfsuite.Tagger()
+    _tagger.open(modelfile)
+
+def _tag_chunk(xseqs) :
+    return [_tagger.tag(xseq) for xseq in xseqs]
+
+# number of sentences sent to a tagging process at once
+TAG_CHUNK = 200
+
+
 class CRF:
 
     ## --------------------------------------------------
     ## Constructor: Load model from file
+    ## n_jobs is the number of processes used to tag sentences
+    ## in predict_batch (-1: one per core)
     ## --------------------------------------------------
-    def __init__(self, modelfile=None, params=None):
+    def __init__(self, modelfile=None, params=None, n_jobs=1):
 
         self.modelfile = modelfile
+        self.n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+        self.pool = None  # tagging processes, started when first needed
         if params is None:
             # only modelfile given, assume it is an existing model and load it        
             # modelfile given, assume it is an existing model and load it
@@ -30,12 +89,17 @@ class CRF:
             c1 = float(params['c1']) if 'c1' in params else 0.1
             c2 = float(params['c2']) if 'c2' in params else 1.0
             eps = float(params['epsilon']) if 'epsilon' in params else 0.00001
+            # early stopping: number of iterations without improvement on
+            # holdout data (devel.feat next to training file, if not given)
+            self.patience = int(params['early_stop']) if 'early_stop' in params else None
+            self.holdout = params['holdout'] if 'holdout' in params else None
             # select needed parametes depending on the agorithm
             params = {'feature.minfreq' : minf, 'max_iterations' : maxit}
             if alg == "lbfgs" : params['c1'] = c1
             if alg in ["lbfgs", "l2sgd"] : params['c2'] = c2
             if alg != "l2sgd" : params['epsilon'] = eps
             # create and train empty classifier with given algorithm and parameters
+            self.algorithm, self.params = alg, params
             self.trainer = pycrfsuite.Trainer(alg, params)
 
     ## --------------------------------------------------
@@ -43,13 +107,55 @@ class CRF:
     ## --------------------------------------------------
     def train(self, datafile):
         # load dataset
-        ds = Dataset(datafile)
-        # add examples to trainer
-        for xseq, yseq, _ in ds.instances() :
-            self.trainer.append(xseq, yseq, 0)
+        ds = Dataset(datafile, index=False)
+        holdout = None
+        if self.patience is not None :
+            hfile = self.holdout or os.path.join(os.path.dirname(datafile), "devel.feat")
+            holdout = Dataset(hfile, index=False).instances()
+        self.train_instances(ds.instances(), holdout)
 
-        # train and store model 
-        self.trainer.train(self.modelfile, -1)
+    ## --------------------------------------------------
+    ## train a model on given (xseq, yseq, toks) sentences, as returned
+    ## by Dataset.instances(), store in modelfile.
+    ## If early stopping is active, holdout sentences are used to find
+    ## the best number of iterations.
+    ## --------------------------------------------------
+    def train_instances(self, instances, holdout=None):
+        if self.patience is None :
+            # add examples to trainer
+            for xseq, yseq, _ in instances :
+                self.trainer.append(xseq, yseq, 0)
+            # train and store model 
+            self.trainer.train(self.modelfile, -1)
+            return
+
+        # keep sentences, they are needed twice
+        instances = [(xseq, yseq) for xseq, yseq, _ in instances]
+
+        # train evaluating on holdout sentences (group 1), until F1
+        # stops improving or max_iterations are reached
+        trainer = HoldoutTrainer(self.algorithm, self.params, self.patience)
+        for xseq, yseq in instances :
+            trainer.append(xseq, yseq, 0)
+        for xseq, yseq, _ in holdout :
+            trainer.append(xseq, yseq, 1)
+        try :
+            trainer.train(self.modelfile, 1)
+        except StopTraining :
+            pass
+        best, last = trainer.best_iteration, trainer.last_iteration
+        print(f"Best holdout F1={trainer.best_f1:.4f} at iteration {best}")
+        del trainer
+
+        # if last model is not the best one (or training was stopped and
+        # no model was stored), train again up to best iteration. Training
+        # is deterministic, so this gives the best model.
+        if best < last :
+            self.trainer = pycrfsuite.Trainer(self.algorithm,
+                                              dict(self.params, max_iterations=best))
+            for xseq, yseq in instances :
+                self.trainer.append(xseq, yseq, 0)
+            self.trainer.train(self.modelfile, -1)
 
         
     ## --------------------------------------------------
@@ -62,3 +168,37 @@ class CRF:
 
         return self.tagger.tag(xseq)
 
+
+    ## --------------------------------------------------
+    ## predict best class for each element of each sequence in xseqs.
+    ## CRF tags whole sequences, so they are processed one by one, or
+    ## in chunks by a pool of n_jobs processes. The pool is started on
+    ## the first call and kept for the next ones (see close), so each
+    ## process opens the model only once. Results keep the order of xseqs.
+    ## --------------------------------------------------
+    def predict_batch(self, xseqs):
+        if self.n_jobs <= 1 or len(xseqs) <= TAG_CHUNK :
+            return [self.predict(xseq) for xseq in xseqs]
+
+        if self.pool is None :
+            self.pool = multiprocessing.get_context("fork").Pool(self.n_jobs,
+                                                                 initializer=_open_tagger,
+                                                                 initargs=(self.modelfile,))
+        chunks = [xseqs[i:i+TAG_CHUNK] for i in range(0, len(xseqs), TAG_CHUNK)]
+        return [yseq for ychunk in self.pool.imap(_tag_chunk, chunks) for yseq in ychunk]
+
+    ## --------------------------------------------------
+    ## stop tagging processes, if any. The model can also be used
+    ## in a 'with' statement, which closes it at the end.
+    ## --------------------------------------------------
+    def close(self):
+        if self.pool is not None :
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -5,10 +5,9 @@ import sys
 import pickle
 
 import scipy
-import sklearn
-from sklearn.linear_model import LogisticRegression
 
 import dataset
+import linear_model
 
 
 class MEM:
@@ -21,10 +20,15 @@ class MEM:
         self.modelfile = modelfile
         if params is None:
             # only modelfile given, assume it is an existing model and load it        
-            with open(self.modelfile, 'rb') as df :
-                self.tagger = pickle.load(df)
-            with open(self.modelfile+".idx", 'rb') as df :
-                self.fidx = pickle.load(df)
+            if linear_model.is_linear_model(self.modelfile) :
+                # compact model, it encodes features itself
+                self.tagger = self.fidx = linear_model.LinearModel(self.modelfile)
+            else :
+                # old pickled sklearn model and feature index
+                with open(self.modelfile, 'rb') as df :
+                    self.tagger = pickle.load(df)
+                with open(self.modelfile+".idx", 'rb') as df :
+                    self.fidx = pickle.load(df)
                 
         else :  # params given, create new empty model
 
@@ -32,8 +36,16 @@ class MEM:
             C = float(params['C']) if 'C' in params else 1.0
             solver = params['solver'] if 'solver' in params else 'lbfgs'
             maxit = params['max_iter'] if 'max_iter' in params else 1500
+            # number of buckets for feature hashing. If not given, features are indexed
+            hash_size = int(params['hash_size']) if 'hash_size' in params else None
+            self.hasher = dataset.feature_hasher(hash_size) if hash_size else None
+            # indexed feature pruning: minimum frequency, and number of features
+            # to keep by chi-squared selection (all, if not given)
+            self.minfreq = int(params['minfreq']) if 'minfreq' in params else 1
+            self.kbest = int(params['kbest']) if 'kbest' in params else None
 
             # create and train empty classifier with given parameters
+            from sklearn.linear_model import LogisticRegression
             self.tagger = LogisticRegression(verbose=1,
                                              C=C,
                                              solver=solver,
@@ -45,7 +57,8 @@ class MEM:
     ## --------------------------------------------------
     def train(self, datafile):
         # load dataset
-        ds = dataset.Dataset(datafile)
+        ds = dataset.Dataset(datafile, hasher=self.hasher,
+                             minfreq=self.minfreq, kbest=self.kbest)
         self.fidx = ds.feature_index()
 
         # Read training instances 
@@ -54,9 +67,9 @@ class MEM:
         # train classifier
         self.tagger.fit(X,Y)
 
-        # save model
-        pickle.dump(self.tagger, open(self.modelfile, 'wb'))
-        pickle.dump(self.fidx, open(self.modelfile+".idx", 'wb'))
+        # save model weights and feature index in compact format
+        linear_model.save(self.modelfile, self.tagger.classes_,
+                          self.tagger.coef_, self.tagger.intercept_, self.fidx)
     
 
     ## --------------------------------------------------
@@ -67,21 +80,25 @@ class MEM:
         if len(xseq)==0 : return []
         
         # Encode xseq into a CSR sparse matrix
-        rowi = [] # row (example number)
-        colj = [] # column (feature number)
-        data = [] # value (1 or 0 since we use binary features)
-        nex = 0 # example  counter (each word is one example)
-        for w in xseq :
-            for f in w :
-                if f in self.fidx :
-                    data.append(1)
-                    rowi.append(nex)
-                    colj.append(self.fidx[f]) 
-                    # next word           
-            nex += 1
-        X = scipy.sparse.csr_matrix((data, (rowi, colj)), shape=(len(xseq),len(self.fidx)))
+        X = dataset.encode(xseq, self.fidx)
         
         # apply model to X and return predictions
         return self.tagger.predict(X)
 
 
+    ## --------------------------------------------------
+    ## predict best class for each element of each sequence in xseqs.
+    ## All elements are encoded and classified at once, and
+    ## predictions are split back into one list per sequence.
+    ## --------------------------------------------------
+    def predict_batch(self, xseqs):
+        words = [w for xseq in xseqs for w in xseq]
+        if len(words)==0 : return [[] for _ in xseqs]
+
+        Y = self.tagger.predict(dataset.encode(words, self.fidx))
+
+        preds, k = [], 0
+        for xseq in xseqs :
+            preds.append(Y[k:k+len(xseq)])
+            k += len(xseq)
+        return preds
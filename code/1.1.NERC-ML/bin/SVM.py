@@ -5,10 +5,13 @@ import sys
 import pickle
 
 import scipy
-import sklearn
-from sklearn.svm import SVC
+import numpy as np
 
 import dataset
+import linear_model
+
+# maximum number of elements classified at once
+PREDICT_ROWS = 20000
 
 class SVM:
 
@@ -21,8 +24,20 @@ class SVM:
         
         if params is None :
             # only modelfile given, assume it is an existing model and load it        
+            if linear_model.is_linear_model(self.modelfile) :
+                # compact linear model, it encodes features itself
+                self.tagger = self.fidx = linear_model.LinearModel(self.modelfile)
+                return
+
+            from sklearn.kernel_approximation import RBFSampler
             with open(self.modelfile, 'rb') as df :
                 self.tagger = pickle.load(df)
+            # random Fourier features are not stored, regenerate them
+            # (they only depend on the random seed and number of features)
+            if hasattr(self.tagger, "steps") :
+                rff = self.tagger.steps[0][1]
+                if isinstance(rff, RBFSampler) :
+                    rff.fit(np.zeros((1, rff.n_features_in_)))
             with open(self.modelfile+".idx", 'rb') as df :
                 self.fidx = pickle.load(df)
 
@@ -33,14 +48,50 @@ class SVM:
             kernel = params['kernel'] if 'kernel' in params else 'rbf'
             degree = int(params['degree']) if 'degree' in params else 3
             gamma = float(params['gamma']) if 'gamma' in params else 'scale'
-                
+            # number of buckets for feature hashing. If not given, features are indexed
+            hash_size = int(params['hash_size']) if 'hash_size' in params else None
+            self.hasher = dataset.feature_hasher(hash_size) if hash_size else None
+            # indexed feature pruning: minimum frequency, and number of features
+            # to keep by chi-squared selection (all, if not given)
+            self.minfreq = int(params['minfreq']) if 'minfreq' in params else 1
+            self.kbest = int(params['kbest']) if 'kbest' in params else None
+            # fast mode: 'linear' (linear SVM on sparse features), 'nystroem' or
+            # 'rff' (kernel approximated by n_components dense features, then
+            # a linear SVM). If not given, a full kernel SVM is used.
+            fast = params['fast'] if 'fast' in params else None
+            n_components = int(params['n_components']) if 'n_components' in params else 500
+            # gamma='scale' depends on training data, it is computed in train
+            self.gamma = gamma
+            self.fast = fast
+
+            from sklearn.svm import SVC, LinearSVC
+            from sklearn.kernel_approximation import Nystroem, RBFSampler
+            from sklearn.pipeline import make_pipeline
+
             # create classifier
-            self.tagger = SVC(verbose=True,
-                              C=C,
-                              kernel=kernel,
-                              degree=degree,
-                              gamma=gamma
-                              )
+            if fast is None :
+                self.tagger = SVC(verbose=True,
+                                  C=C,
+                                  kernel=kernel,
+                                  degree=degree,
+                                  gamma=gamma
+                                  )
+            elif fast == "linear" :
+                self.tagger = LinearSVC(verbose=1, C=C)
+            elif fast == "nystroem" :
+                self.tagger = make_pipeline(Nystroem(kernel=kernel,
+                                                     degree=degree,
+                                                     n_components=n_components,
+                                                     random_state=0),
+                                            LinearSVC(verbose=1, C=C))
+            elif fast == "rff" :
+                # random Fourier features only approximate the rbf kernel
+                self.tagger = make_pipeline(RBFSampler(n_components=n_components,
+                                                       random_state=0),
+                                            LinearSVC(verbose=1, C=C))
+            else :
+                print(f"Invalid SVM fast mode '{fast}'", file=sys.stderr)
+                sys.exit(1)
 
 
     ## --------------------------------------------------
@@ -48,17 +99,39 @@ class SVM:
     ## --------------------------------------------------
     def train(self, datafile):
         # load dataset
-        ds = dataset.Dataset(datafile)
+        ds = dataset.Dataset(datafile, hasher=self.hasher,
+                             minfreq=self.minfreq, kbest=self.kbest)
         self.fidx = ds.feature_index()
 
         # Read training instances 
         X,Y = ds.csr_matrix()
 
+        # set kernel approximation gamma, as SVC would compute it
+        if hasattr(self.tagger, "steps") :
+            gamma = self.gamma
+            if gamma == 'scale' :
+                var = X.multiply(X).mean() - X.mean()**2
+                gamma = 1.0/(X.shape[1]*var) if var != 0 else 1.0
+            self.tagger.steps[0][1].set_params(gamma=gamma)
+
         # train classifier
         self.tagger.fit(X,Y)
 
-        # save model
-        pickle.dump(self.tagger, open(self.modelfile, 'wb'))
+        # save model. Linear models are stored in compact format.
+        # Random Fourier features are a large dense matrix, they are
+        # left out and regenerated when the model is loaded
+        if self.fast == "linear" :
+            linear_model.save(self.modelfile, self.tagger.classes_,
+                              self.tagger.coef_, self.tagger.intercept_, self.fidx)
+            return
+        elif self.fast == "rff" :
+            rff = self.tagger.steps[0][1]
+            weights, offset = rff.random_weights_, rff.random_offset_
+            rff.random_weights_ = rff.random_offset_ = None
+            pickle.dump(self.tagger, open(self.modelfile, 'wb'))
+            rff.random_weights_, rff.random_offset_ = weights, offset
+        else :
+            pickle.dump(self.tagger, open(self.modelfile, 'wb'))
         pickle.dump(self.fidx, open(self.modelfile+".idx", 'wb'))
     
 
@@ -69,19 +142,28 @@ class SVM:
         if len(xseq)==0 : return []
         
         # Encode xseq into a CSR sparse matrix
-        rowi = [] # row (example number)
-        colj = [] # column (feature number)
-        data = [] # value (1 or 0 since we use binary features)
-        nex = 0 # example  counter (each word is one example)
-        for w in xseq :
-            for f in w :
-                if f in self.fidx :
-                    data.append(1)
-                    rowi.append(nex)
-                    colj.append(self.fidx[f]) 
-                    # next word           
-            nex += 1
-        X = scipy.sparse.csr_matrix((data, (rowi, colj)), shape=(len(xseq),len(self.fidx)))
+        X = dataset.encode(xseq, self.fidx)
         
         # apply model to X and return predictions
         return self.tagger.predict(X)
+
+
+    ## --------------------------------------------------
+    ## predict best class for each element of each sequence in xseqs.
+    ## All elements are encoded and classified at once, and
+    ## predictions are split back into one list per sequence.
+    ## --------------------------------------------------
+    def predict_batch(self, xseqs):
+        words = [w for xseq in xseqs for w in xseq]
+        if len(words)==0 : return [[] for _ in xseqs]
+
+        # classify by slices, kernel approximations are dense
+        X = dataset.encode(words, self.fidx)
+        Y = np.concatenate([self.tagger.predict(X[i:i+PREDICT_ROWS])
+                            for i in range(0, X.shape[0], PREDICT_ROWS)])
+
+        preds, k = [], 0
+        for xseq in xseqs :
+            preds.append(Y[k:k+len(xseq)])
+            k += len(xseq)
+        return preds
@@ -1,6 +1,47 @@
+from array import array
+import numpy as np
 import scipy
 #from scipy.sparse import csr_matrix
 
+import paths
+from featfile import FeatFile, is_featfile
+
+
+## ------ create a feature hasher with given number of buckets. Features
+## ------ are hashed with alternating signs, so collisions tend to cancel out.
+def feature_hasher(n_buckets) :
+    from sklearn.feature_extraction import FeatureHasher
+    return FeatureHasher(n_features=n_buckets, input_type="string", alternate_sign=True)
+
+## ------ encode a list of examples (each a list of string features) as a
+## ------ sparse matrix, using given feature index: either a dictionary
+## ------ feature->column, or an object encoding them with a transform
+## ------ method (a FeatureHasher, or a linear_model.LinearModel).
+## ------ Unknown features are ignored.
+def encode(examples, fidx) :
+    if hasattr(fidx, "transform") :
+        return fidx.transform(examples)
+
+    # column of each known feature (CSR indices), and where each
+    # example starts (CSR indptr). Values are 1 (binary features)
+    indices = array("i")
+    indptr = array("i", [0])
+    col = fidx.get
+    for w in examples :
+        indices.extend([j for j in map(col, w) if j is not None])
+        indptr.append(len(indices))
+
+    # float64 values, the type sklearn classifiers work with
+    data = np.ones(len(indices), dtype=np.float64)
+    X = scipy.sparse.csr_matrix((data,
+                                 np.frombuffer(indices, dtype=np.int32),
+                                 np.frombuffer(indptr, dtype=np.int32)),
+                                shape=(len(examples),len(fidx)))
+    # repeated features are stored once, as in Dataset.csr_matrix
+    X.sum_duplicates()
+    return X
+
+
 
 #-------------------------------------------
 # Class to handle a dataset made of sentences, where
@@ -10,18 +51,47 @@ import scipy
 class Dataset :
 
     ## ------ Constructor. Load given datafile & index features.
-    def __init__(self, datafile) :
+    ## ------ Datafile may be a binary feature file (see util/featfile.py),
+    ## ------ which is memory-mapped, or an old tab-separated one.
+    ## ------ If a hasher is given, features are hashed instead of indexed.
+    ## ------ If index is False, features are neither indexed nor hashed
+    ## ------ (e.g. data to be annotated by an existing model).
+    ## ------ Indexed features appearing in less than minfreq words are
+    ## ------ dropped and, if kbest is given, only the kbest features most
+    ## ------ related to the labels (chi-squared test) are kept.
+    def __init__(self, datafile, hasher=None, index=True, minfreq=1, kbest=None) :
         self.fidx = {}
+        self.hasher = hasher
+        index = index and hasher is None
         self.sentences = []
-        with open(datafile) as df :
-            for xseq, yseq, toks in self.__sequences(df):
-                # load pair
-                self.sentences.append((xseq,yseq,toks))
-                # add features to index
-                for w in xseq :
-                    for f in w :
-                        if f not in self.fidx :
-                            self.fidx[f] = len(self.fidx)
+        self.ff = None
+        self.XY = None
+        # column of each feature occurrence, and where each word starts
+        # (CSR matrix indices and indptr), collected while loading
+        self.indices = array("i")
+        self.indptr = array("i", [0])
+
+        if is_featfile(datafile) :
+            self.ff = FeatFile(datafile)
+            # features are numbered by first appearance, as in the index
+            if index : self.fidx = {f:i for i,f in enumerate(self.ff.features)}
+        else :
+            fidx, indices, indptr = self.fidx, self.indices, self.indptr
+            with open(datafile) as df :
+                for xseq, yseq, toks in self.__sequences(df):
+                    # load pair
+                    self.sentences.append((xseq,yseq,toks))
+                    # add features to index
+                    if not index : continue
+                    for w in xseq :
+                        for f in w :
+                            j = fidx.get(f)
+                            if j is None : j = fidx[f] = len(fidx)
+                            indices.append(j)
+                        indptr.append(len(indices))
+
+        # drop infrequent or uninformative features
+        if index and (minfreq > 1 or kbest) : self.__prune(minfreq, kbest)
 
     ## ------ auxilary for load. 
     def __sequences(self, fi):
@@ -49,33 +119,76 @@ class Dataset :
             yseq.append(fields[4])  # label (ground truth)
             xseq.append(fields[5:]) # features
 
-    ## ------ give access to feature index
+    ## ------ auxiliary for constructor: remove pruned features from the
+    ## ------ matrix and the index. Remaining ones keep their relative order.
+    def __prune(self, minfreq, kbest) :
+        X,Y = self.csr_matrix()
+        # number of words where each feature appears
+        keep = np.bincount(X.indices, minlength=X.shape[1]) >= minfreq
+        if kbest and keep.sum() > kbest :
+            from sklearn.feature_selection import chi2
+            cols = np.flatnonzero(keep)
+            scores = np.nan_to_num(chi2(X[:,cols], Y)[0])
+            keep[:] = False
+            keep[cols[np.argsort(-scores, kind="stable")[:kbest]]] = True
+
+        cols = np.flatnonzero(keep)
+        features = list(self.fidx)
+        self.fidx = {features[j]:i for i,j in enumerate(cols.tolist())}
+        self.XY = (X[:,cols], Y)
+
+    ## ------ give access to feature index (the hasher, if features are hashed)
     def feature_index(self) :
-        return self.fidx
+        return self.hasher if self.hasher is not None else self.fidx
 
-    ## ------ return dataset as a sparse matrix, plus associated gold labels
+    ## ------ return dataset as a sparse matrix, plus associated gold labels.
+    ## ------ The matrix is built once and kept, later calls return the same one.
     def csr_matrix(self) :
-        rowi = [] # row (example number)
-        colj = [] # column (feature number)
-        data = [] # value (1 or 0 since we use binary features)
-        Y = [] # ground truth
-        nex = 0 # example  counter (each word is one example)
-
-        # for each sentence
-        for xseq,yseq,_ in self.sentences :
-            Y.extend(yseq)
-            for w in xseq :
-                for f in w :
-                    data.append(1)
-                    rowi.append(nex)
-                    colj.append(self.fidx[f]) 
-                # next word           
-                nex += 1
-            
-        X = scipy.sparse.csr_matrix((data, (rowi, colj)))  
+        if self.XY is None :
+            self.XY = self.__build_matrix()
+        return self.XY
+
+    ## ------ auxiliary for csr_matrix
+    def __build_matrix(self) :
+        if self.hasher is not None :
+            Y = [y for _,yseq,_ in self.instances() for y in yseq]
+            X = self.hasher.transform(w for xseq,_,_ in self.instances() for w in xseq)
+            return X,Y
+
+        if self.ff is not None :
+            # feature ids in the file are the matrix columns
+            Y = self.ff.column("tag")
+            indices, indptr = self.ff.feat_ids, self.ff.feat_ptr
+            ncols = len(self.ff.features)
+        else :
+            # column numbers collected while loading
+            Y = [y for _,yseq,_ in self.sentences for y in yseq]
+            indices = np.frombuffer(self.indices, dtype=np.int32)
+            indptr = np.frombuffer(self.indptr, dtype=np.int32)
+            ncols = len(self.fidx)
+
+        # binary features, all stored values are 1. A feature repeated in an
+        # example is stored once, with values added up as when building from
+        # coordinates, so pruning counts each example once. Summing sorts
+        # indices in place, so arrays mapped from a feature file are copied.
+        # Values are float64, so sklearn classifiers use the matrix as it is
+        # instead of converting it to floats in fit (a full copy).
+        data = np.ones(len(indices), dtype=np.float64)
+        X = scipy.sparse.csr_matrix((data, indices, indptr), shape=(len(indptr)-1, ncols),
+                                    copy=self.ff is not None)
+        X.sum_duplicates()
         return X,Y
                 
     ## ------ iterator to access each sentence in the dataset
     def instances(self) :
+        if self.ff is not None :
+            ff = self.ff
+            for start,end in ff.groups() :
+                info = [ff.row_info(r) for r in range(start,end)]
+                yield ([ff.row_features(r) for r in range(start,end)],
+                       [x[4] for x in info],
+                       [x[:4] for x in info])
+            return
+
         for x,y,z in self.sentences :
             yield x,y,z
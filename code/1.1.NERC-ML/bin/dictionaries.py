@@ -1,78 +1,63 @@
 
 import sys, os
 import json
-import spacy
 
 import paths
+from lexicon import Lexicon
 
 
 # -------------------------------------------------------------------
 class Dictionaries() :
-    
-  def __init__(self, filename=None) :
-      
+
+  ## ---- Load dictionaries from given .json file, or use the compiled
+  ## ---- resources lexicon (see util/lexicon.py) if no filename is given.
+  ## ---- The lexicon is loaded (and compiled, if resources changed) the
+  ## ---- first time it is used.
+  def __init__(self, filename=None, n_process=None) :
+
       if filename is not None :
           if filename.endswith(".json") :
-              # parameter is a pickle file, load it
+              # parameter is a json file, load it
               with open(filename) as pf:
-                  self.data = json.load(pf)
+                  data = json.load(pf)
+              if "sources" in data :
+                  # one section per resource file, merge them
+                  sections = list(data["sources"].values())
+              else :
+                  sections = [data]
+              self.data = {'external' : {}, 'externalpart' : {}}
+              for sec in sections :
+                  for d in self.data :
+                      for x,v in sec[d].items() :
+                          self.data[d].setdefault(x, set()).update(v)
           else :
               print("ERROR. Expected .json file", file = sys.stderr)
               sys.exit(1)
-        
-      else :
-          # create stanza tokenizer
-          nlp = spacy.load("en_core_web_trf", enable=["tokenizer"])
 
-          self.data = {}
-          self.data['external'] = {}
-          self.data['externalpart'] = {}
-          print("Processing HSDB")
-          with open(os.path.join(paths.RESOURCES,"HSDB.txt")) as h :
-              for x in h.readlines() :
-                  self.data['external'][x.strip().lower()] = set(["drug"])
-                  wds = nlp(x)
-                  if len(wds)>1 : 
-                      for tk in wds :
-                          self.data['externalpart'][tk.text] = set(["drug"])
-
-          print("Processing DrugBank")
-          with open(os.path.join(paths.RESOURCES,"DrugBank.txt")) as h :
-              for x in h.readlines() :
-                  (n,t) = x.strip().lower().split("|")
-                  if n in self.data['external'] : self.data['external'][n].add(t)
-                  else : self.data['external'][n] = set([t])
-                  wds = nlp(n)
-                  if len(wds)>1 : 
-                      for tk in wds :
-                          if tk.text in self.data['externalpart'] : self.data['externalpart'][tk.text].add(t)
-                          else : self.data['externalpart'][tk.text] = set([t])
+      else :
+          # HSDB entries are drugs, and names are split with spaCy tokenizer
+          self.lexicon = Lexicon(hsdb_type="drug", tokenizer="spacy",
+                                 resources=paths.RESOURCES, n_process=n_process)
+          self.data = None
 
-          print("Processing train")
-          with open(os.path.join(paths.RESOURCES,"drugs-train.txt")) as h :
-              for x in h.readlines() :
-                  (_,_,n,t) = x.strip().lower().split("|")
-                  if n in self.data['external'] : self.data['external'][n].add(t)
-                  else : self.data['external'][n] = set([t])
-                  wds = nlp(n)
-                  if len(wds)>1 : 
-                      for tk in wds :
-                          if tk.text in self.data['externalpart'] : self.data['externalpart'][tk.text].add(t)
-                          else : self.data['externalpart'][tk.text] = set([t])
+  ## ---- compile lexicon, if needed
+  def compile(self) :
+      if self.data is None :
+          self.data = {'external' : self.lexicon.external,
+                       'externalpart' : self.lexicon.externalpart}
 
   ## ---- find entry in dictionaries
   def find(self, txt, section) :
+    if self.data is None : self.compile()
     if txt in self.data[section] :
       return True, self.data[section][txt]
     else :
       return False, None
 
-  ## ---- save dataset to json file
+  ## ---- save dictionaries to json file
   def save(self, filename) :
-      for x in self.data:
-         for y in self.data[x] :
-             self.data[x][y] = list(self.data[x][y])
-             
+      self.compile()
       with open(filename+".json", "w") as pf:
-          json.dump(self.data, pf, indent=3, ensure_ascii=False)
+          json.dump({x : {y : sorted(v) for y,v in self.data[x].items()} for x in self.data},
+                    pf, separators=(",",":"), ensure_ascii=False)
 
@@ -2,36 +2,18 @@
 
 import sys, os
 import re
-from xml.dom.minidom import parse
-import spacy
 
 import paths
+import corpus
+from analysis_cache import AnalysisCache
 from dictionaries import Dictionaries
+from affixes import CHEM_PREFIXES, SUFFIXES
+from featfile import FeatWriter, FORMATS
 
 import nltk
 from nltk.corpus import stopwords
 
 
-CHEM_PREFIXES = {'nor','des','dex','iso','neo','oxo','oxy',
-                 'pro','sul','tri','ben','eth','meth','prop',
-                 'cef','cep','flu','ami','car','clo',
-                 'phe','rif','ver','hal'}
-
-CHEM_SUFFIXES = {'ine','ide','ate','ase','ium','one','ene',
-                 'ole','ane','cin','zol','pam','lol','pril',
-                 'mab','tin','vir','xan','fen','zan',
-                 'oxin','pine','line','mine','azine','idine',
-                 'oxine','tocin','barbital','floxacin','lukast','dipine'}
-
-DRUGN_SUFFIXES = {'atin', 'idin', 'osin', 'asin', 'itol',
-                  'esin', 'thane', 'statin', 'tropin',
-                  'toxin', 'amine', 'idine'}
-
-GROUP_SUFFIXES = {'ones', 'oids', 'ines', 'ants', 'tics', 'ives',
-                  'ents', 'ases', 'oles', 'anes', 'kers',
-                  'sants', 'nics', 'zines', 'nols', 'xants'}
-
-
 ## --------- get tag ----------- 
 ##  Find out whether given token is marked as part of an entity in the XML
 def get_label(tks, tke, spans) :
@@ -40,82 +22,83 @@ def get_label(tks, tke, spans) :
         elif tks>spanS and tke<=spanE+1 : return "I-"+spanT
     return "O"
 
-# t: token
-# tokenFeatures: feature list
-# i: current token position
-# dist: distance to current token. Is Prev if negative, Next if positive, current if 0
-
-def features_by_pos(tokens, tokenFeatures, i, dist, dicts):
-   # Calculate the target index
-   idx = i + dist
-
-   if idx < 0 or idx >= len(tokens):
-     return 
-
-   # Get the token text
-   tk_text = tokens[idx].text
-
-   if dist > 0:
-     suffix = f"Next{dist}"
-   elif dist < 0:
-     suffix = f"Prev{abs(dist)}"
-   else:
-     suffix = "" # Current token gets no suffix
-
-   tokenFeatures.append(f"form{suffix}={tk_text}")
-   #tokenFeatures.append(f"formlower{suffix}={tk_text.lower()}")
-   tokenFeatures.append(f"suf2{suffix}={tk_text[-2:]}")
-   tokenFeatures.append(f"suf3{suffix}={tk_text[-3:]}")
-   tokenFeatures.append(f"suf4{suffix}={tk_text[-4:]}")
-   tokenFeatures.append(f"suf5{suffix}={tk_text[-5:]}")
-   #tokenFeatures.append(f"suf6{suffix}={tk_text[-6:]}")
-
-   tokenFeatures.append(f"pref2{suffix}={tk_text[:2]}")
-   tokenFeatures.append(f"pref3{suffix}={tk_text[:3]}")
-   #tokenFeatures.append(f"pref4{suffix}={tk_text[:4]}")
-
-   tokenFeatures.append(f"POS{suffix}={tokens[idx].pos_}")
-   tokenFeatures.append(f"shape{suffix}={tokens[idx].shape}")
-   #tokenFeatures.append(f"lemma{suffix}={tokens[idx].lemma_}")
-
-   if tk_text.isupper(): tokenFeatures.append(f"isUpper{suffix}")
-   if tk_text.istitle(): tokenFeatures.append(f"isTitle{suffix}")
-
-   tokenFeatures.append(f"dep{suffix}={tokens[idx].dep_}")
-   tokenFeatures.append(f"headForm{suffix}={tokens[idx].head.text.lower()}")
+## --------- Token features -----------
+## -- Compute the features of a single token, as a list of (name, value)
+## -- pairs, where value is "=..." or "" for binary features.
+## -- Features for tokens in the window around the current one are
+## -- obtained adding their position to the name (e.g. "suf3Prev1=ine"),
+## -- so each token features are computed only once per sentence.
+
+def token_features(tk, dicts):
+   tk_text = tk.text
+   tk_lower = tk_text.lower()
+
+   feats = [("form", "="+tk_text),
+            #("formlower", "="+tk_lower),
+            ("suf2", "="+tk_text[-2:]),
+            ("suf3", "="+tk_text[-3:]),
+            ("suf4", "="+tk_text[-4:]),
+            ("suf5", "="+tk_text[-5:]),
+            #("suf6", "="+tk_text[-6:]),
+            ("pref2", "="+tk_text[:2]),
+            ("pref3", "="+tk_text[:3]),
+            #("pref4", "="+tk_text[:4]),
+            ("POS", "="+tk.pos_),
+            ("shape", "="+str(tk.shape)),
+            #("lemma", "="+tk.lemma_),
+           ]
+
+   if tk_text.isupper(): feats.append(("isUpper", ""))
+   if tk_text.istitle(): feats.append(("isTitle", ""))
+
+   feats.append(("dep", "="+tk.dep_))
+   feats.append(("headForm", "="+tk.head.text.lower()))
 
    #if re.match(r'^([A-Z][a-z]?\d*(\+|-)?)+$', tk_text):
-      #tokenFeatures.append(f"isChemFormula{suffix}")
+      #feats.append(("isChemFormula", ""))
 
-   #if tk_text in stopwords_eng: tokenFeatures.append(f"isStopWord{suffix}")
+   #if tk_text in stopwords_eng: feats.append(("isStopWord", ""))
 
-   if '-' in tk_text: tokenFeatures.append(f"hasDash{suffix}")
+   if '-' in tk_text: feats.append(("hasDash", ""))
 
-   found, val = dicts.find(tk_text.lower(), 'external')
+   found, val = dicts.find(tk_lower, 'external')
    if found:
-     for c in val: tokenFeatures.append(f"external{suffix}={c}")
+     for c in val: feats.append(("external", "="+c))
      
-   found, val = dicts.find(tk_text.lower(), 'externalpart')
+   found, val = dicts.find(tk_lower, 'externalpart')
    if found:
-     for c in val: tokenFeatures.append(f"externalpart{suffix}={c}")
+     for c in val: feats.append(("externalpart", "="+c))
 
+   feats.append(("spaCyNER", "="+tk.ent_type_))
+   feats.append(("spaCyIOB", "="+tk.ent_iob_))
 
-   tokenFeatures.append(f"spaCyNER{suffix}={tokens[idx].ent_type_}")
-   tokenFeatures.append(f"spaCyIOB{suffix}={tokens[idx].ent_iob_}")
+   return feats
+
+# name suffix for features of tokens at each distance from the current one
+# (negative distances are previous tokens, positive are next ones)
+WINDOW = {-2:"Prev2", -1:"Prev1", 1:"Next1", 2:"Next2"}
 
 
 ## --------- Feature extractor ----------- 
 ## -- Extract features for each token in given sentence
 def extract_sentence_features(tokens, dicts):
    sentenceFeatures = {}
-    
+
+   # compute features of each token once
+   base = [token_features(tk, dicts) for tk in tokens]
+   current = [[k+v for k,v in f] for f in base]
+
    for i, tk in enumerate(tokens):
       tokenFeatures = []
 
       # Loop through a window of -2 to +2
       for j in range(-2, 3):
-         # Pass tokens, feature list, index, distance, and dicts
-         features_by_pos(tokens, tokenFeatures, i, j, dicts)
+         idx = i + j
+         if idx < 0 or idx >= len(tokens): continue
+         if j == 0 : tokenFeatures.extend(current[idx])
+         else :
+            pos = WINDOW[j]
+            tokenFeatures.extend([k+pos+v for k,v in base[idx]])
 
       # Add Beginning/End of Sentence markers
       if i == 0:
@@ -128,16 +111,19 @@ def extract_sentence_features(tokens, dicts):
       if i < len(tokens)-1 and tokens[i+1].text == ')':
          tokenFeatures.append("beforeCloseParen")
 
-      if tk.text[:3].lower() in CHEM_PREFIXES:
+      tk_lower = tk.text.lower()
+      if tk_lower[:3] in CHEM_PREFIXES:
          tokenFeatures.append(f"chemPrefix")
 
-      if any(tk.text.lower().endswith(s) for s in CHEM_SUFFIXES):
+      # all suffix classes are checked at once
+      suffixes = SUFFIXES.match(tk_lower)
+      if "chemSuffix" in suffixes:
           tokenFeatures.append("chemSuffix")
 
-      if any(tk.text.lower().endswith(s) for s in DRUGN_SUFFIXES):
+      if "drugNSuffix" in suffixes:
           tokenFeatures.append("drugNSuffix")
 
-      if any(tk.text.lower().endswith(s) for s in GROUP_SUFFIXES):
+      if "groupSuffix" in suffixes:
           tokenFeatures.append("groupSuffix")
 
       #if tk.text.isupper() and len(tk.text) <= 4:
@@ -162,53 +148,48 @@ def extract_sentence_features(tokens, dicts):
 ## -- Extract features for each token in each
 ## -- sentence in each file of given dir
 
-def extract_features(datafile, outfile) :
+def extract_features(datafile, outfile, batch_size=64, n_process=1) :
 
-    # load dictionaries
-    dicts = Dictionaries(os.path.join(paths.RESOURCES,"dictionaries.json"))
+    # load dictionaries from compiled resources lexicon
+    dicts = Dictionaries()
 
-    # open output file
-    outf = open(outfile, "w")
+    # open output feature file
+    outf = FeatWriter(outfile, FORMATS["NER"][0])
     
     # create analyzer. We don't need the parser now, it will be faster if disabled
-    nlp = spacy.load("en_core_web_trf", disable=["lemmatizer"])    
-    # parse XML file, obtaining a DOM tree
-    tree = parse(datafile)
-
-    # process each sentence in the file
-    sentences = tree.getElementsByTagName("sentence")
-    for s in sentences :
-      sid = s.attributes["id"].value   # get sentence id
+    nlp = AnalysisCache("en_core_web_trf", disable=["lemmatizer"])    
+    # process each sentence in the file, converting texts to lists of tokens
+    # in batches, and keeping each sentence record attached to its tokens
+    sentences = ((s["text"], s) for s in corpus.sentences(datafile))
+    for tokens, s in nlp.pipe(sentences, batch_size=batch_size, n_process=n_process) :
+      sid = s["id"]   # get sentence id
       print(f"extracting sentence {sid}        \r", end="")
       spans = []
-      stext = s.attributes["text"].value   # get sentence text
-      entities = s.getElementsByTagName("entity") # get gold standard entities
-      for e in entities :
+      for e in s["entities"] : # get gold standard entities
          # for discontinuous entities, we only get the first span
          # (will not work, but there are few of them)
-         (start,end) = e.attributes["charOffset"].value.split(";")[0].split("-")
-         typ =  e.attributes["type"].value
-         spans.append((int(start),int(end),typ))
+         (start,end) = e["spans"][0]
+         spans.append((start,end,e["type"]))
 
-      # convert the sentence to a list of tokens
-      tokens = nlp(stext)
       # extract sentence features
       features = extract_sentence_features(tokens, dicts)
 
-      # print features in format expected by CRF/SVM/MEM trainers
+      # store features in format expected by CRF/SVM/MEM trainers
       for i,tk in enumerate(tokens) :
          # see if the token is part of an entity
          tks,tke = tk.idx, tk.idx+len(tk.text)
          # get gold standard tag for this token
          tag = get_label(tks, tke, spans)
-         # print feature vector for this token
-         print (sid, tk.text, tks, tke-1, tag, "\t".join(features[i]), sep='\t', file=outf)
+         # store feature vector for this token
+         outf.add([sid, tk.text, str(tks), str(tke-1), tag], features[i])
 
-      # blank line to separate sentences
-      print(file=outf)
+      # end of sentence
+      outf.end_group()
 
     # close output file
     outf.close()
+    # store new analyses for later runs
+    nlp.save()
 
 ## --------- MAIN PROGRAM ----------- 
 ## --
@@ -4,23 +4,35 @@
 # Run from the same directory as run.py:
 #   python3 grid_search.py
 #
+# Configurations are trained and evaluated in parallel, one per core.
+# Training and development data are loaded once, before starting the
+# worker processes, which share them (fork). Development data is also
+# used to stop training early (see CRF.py).
+# Each configuration gets its own model file, e.g.
+#   models/grid-c1=0.01-c2=0.2-max_iterations=100-early_stop=20.CRF
+# Predictions are scored in memory. If WRITE_OUTPUT is True, they are
+# also written to an output file, e.g.
+#   results/devel-grid-c1=0.01-c2=0.2-max_iterations=100-early_stop=20.out
+#
 # Results are printed to stdout and saved to grid_search_results.txt
 
-import sys, os, itertools, subprocess
+import sys, os, itertools, contextlib
+import multiprocessing
 
 # ── paths ────────────────────────────────────────────────────────────────────
 import paths  # reuse existing paths module
 
+from dataset import Dataset
+from CRF import CRF
+from predict import entities, output_entities
+from evaluator import load_gold_NER, predicted_set, averages
+
 TRAIN_FEAT  = os.path.join(paths.PREPROCESS, "train.feat")
 DEVEL_FEAT  = os.path.join(paths.PREPROCESS, "devel.feat")
 DEVEL_XML   = os.path.join(paths.DATA,       "devel.xml")
-MODEL_FILE  = os.path.join(paths.MODELS,     "model.CRF")
-RESULTS_OUT = os.path.join(paths.RESULTS,    "devel-CRF.out")
-STATS_FILE  = os.path.join(paths.RESULTS,    "devel-CRF.stats")
 OUTPUT_LOG  = "grid_search_results.txt"
-
-os.makedirs(paths.MODELS,  exist_ok=True)
-os.makedirs(paths.RESULTS, exist_ok=True)
+# write devel predictions of each configuration to results/
+WRITE_OUTPUT = False
 
 # ── hyperparameter grid ──────────────────────────────────────────────────────
 # Add or remove values freely — every combination will be tried
@@ -28,85 +40,93 @@ GRID = {
     "c1":             [0.01, 0.05, 0.1],
     "c2":             [0.2,  0.5,  1.0],
     "max_iterations": [100, 200],
+    # stop when devel F1 does not improve for this many iterations
+    "early_stop":     [20],
 }
 
-# ── helpers ──────────────────────────────────────────────────────────────────
-def parse_stats(stats_file):
-    """Extract macro F1 and micro F1 from the .stats file."""
-    macro_f1 = micro_f1 = None
-    try:
-        with open(stats_file) as f:
-            for line in f:
-                if "M.avg" in line:
-                    parts = line.split()
-                    macro_f1 = float(parts[-1].replace('%',''))
-                elif "m.avg" in line and "no class" not in line:
-                    parts = line.split()
-                    micro_f1 = float(parts[-1].replace('%',''))
-    except FileNotFoundError:
-        pass
-    return macro_f1, micro_f1
+# ── shared data, loaded once by the main process ─────────────────────────────
+TRAIN = None  # training sentences (xseq, yseq, toks)
+DEVEL = None  # development sentences (xseq, yseq, toks)
+GOLD  = None  # gold standard entities in development data
 
 
+# ── helpers ──────────────────────────────────────────────────────────────────
 def run_experiment(params):
-    """Train and evaluate one CRF configuration. Returns (macro_f1, micro_f1)."""
+    """Train and evaluate one CRF configuration. Returns (params, macro_f1, micro_f1)."""
+    name = "grid-" + "-".join(f"{k}={v}" for k,v in params.items())
+    modelfile = os.path.join(paths.MODELS, name+".CRF")
+
     # ── train ────────────────────────────────────────────────────────────────
-    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-    from train import train
-    train(TRAIN_FEAT, params, MODEL_FILE)
+    model = CRF(modelfile, params)
+    # output of parallel runs would be mixed
+    with open(os.devnull, "w") as null, contextlib.redirect_stdout(null):
+        model.train_instances(TRAIN, holdout=DEVEL)
 
     # ── predict ──────────────────────────────────────────────────────────────
-    from predict import predict
-    predict(DEVEL_FEAT, MODEL_FILE, RESULTS_OUT)
+    model = CRF(modelfile)
+    predictions = model.predict_batch([xseq for xseq,_,_ in DEVEL])
+    if WRITE_OUTPUT:
+        outfile = os.path.join(paths.RESULTS, "devel-"+name+".out")
+        with open(outfile, "w") as outf:
+            for (_,_,toks), pred in zip(DEVEL, predictions):
+                output_entities(toks, pred, outf)
 
     # ── evaluate ─────────────────────────────────────────────────────────────
-    sys.path.append(paths.UTIL)
-    from evaluator import evaluate
-    evaluate("NER", DEVEL_XML, RESULTS_OUT, STATS_FILE)
-
-    return parse_stats(STATS_FILE)
+    predicted = predicted_set(e for (_,_,toks), pred in zip(DEVEL, predictions)
+                                for e in entities(toks, pred))
+    avgs = averages(GOLD, predicted)
+    return params, round(100*avgs["M.avg"][2], 1), round(100*avgs["m.avg"][2], 1)
 
 
 # ── grid search ──────────────────────────────────────────────────────────────
-keys   = list(GRID.keys())
-values = list(GRID.values())
-combos = list(itertools.product(*values))
-
-print(f"Running grid search: {len(combos)} combinations\n")
-print(f"{'c1':>8} {'c2':>6} {'max_iter':>10}  {'MacroF1':>9} {'MicroF1':>9}")
-print("-" * 55)
-
-best_macro = -1
-best_params = None
-results = []
-
-for combo in combos:
-    params = dict(zip(keys, combo))
-    macro, micro = run_experiment(params)
-
-    tag = " ← best" if macro and macro > best_macro else ""
-    if macro and macro > best_macro:
-        best_macro  = macro
-        best_params = params.copy()
-
-    line = (f"c1={params['c1']:<6} c2={params['c2']:<5} "
-            f"iter={params['max_iterations']:<5}  "
-            f"macro={macro or 'ERR':>6}  micro={micro or 'ERR':>6}{tag}")
-    print(line)
-    results.append(line)
-
-# ── summary ──────────────────────────────────────────────────────────────────
-summary = [
-    "\n" + "="*55,
-    f"Best macro F1 : {best_macro:.1f}%",
-    f"Best params   : {best_params}",
-    "="*55,
-]
-for s in summary:
-    print(s)
-results.extend(summary)
-
-with open(OUTPUT_LOG, "w") as f:
-    f.write("\n".join(results))
-
-print(f"\nFull results saved to {OUTPUT_LOG}")
\ No newline at end of file
+if __name__ == "__main__":
+    os.makedirs(paths.MODELS,  exist_ok=True)
+    os.makedirs(paths.RESULTS, exist_ok=True)
+
+    keys   = list(GRID.keys())
+    values = list(GRID.values())
+    combos = [dict(zip(keys, combo)) for combo in itertools.product(*values)]
+
+    # load data once, workers get a copy when forked
+    TRAIN = list(Dataset(TRAIN_FEAT, index=False).instances())
+    DEVEL = list(Dataset(DEVEL_FEAT, index=False).instances())
+    GOLD  = load_gold_NER(DEVEL_XML)
+
+    ncores = os.cpu_count()
+    print(f"Running grid search: {len(combos)} combinations on {ncores} cores\n")
+    print(f"{'c1':>8} {'c2':>6} {'max_iter':>10}  {'MacroF1':>9} {'MicroF1':>9}")
+    print("-" * 55)
+
+    best_macro = -1
+    best_params = None
+    results = []
+
+    with multiprocessing.get_context("fork").Pool(ncores) as pool:
+        # results come in grid order, as soon as each one is available
+        for params, macro, micro in pool.imap(run_experiment, combos):
+            tag = " ← best" if macro > best_macro else ""
+            if macro > best_macro:
+                best_macro  = macro
+                best_params = params.copy()
+
+            line = (f"c1={params['c1']:<6} c2={params['c2']:<5} "
+                    f"iter={params['max_iterations']:<5}  "
+                    f"macro={macro:>6}  micro={micro:>6}{tag}")
+            print(line, flush=True)
+            results.append(line)
+
+    # ── summary ──────────────────────────────────────────────────────────────
+    summary = [
+        "\n" + "="*55,
+        f"Best macro F1 : {best_macro:.1f}%",
+        f"Best params   : {best_params}",
+        "="*55,
+    ]
+    for s in summary:
+        print(s)
+    results.extend(summary)
+
+    with open(OUTPUT_LOG, "w") as f:
+        f.write("\n".join(results))
+
+    print(f"\nFull results saved to {OUTPUT_LOG}")
@@ -1,14 +1,17 @@
 #!/usr/bin/env python3
 
 import sys
+from itertools import islice
 from MEM import *
 from SVM import *
 from CRF import *
 
 # --------------------------------------------------
 # extract identified drugs according to BIO tags for each word.
+# yields a tuple (sid, offset, text, type) for each drug, the
+# fields of a line in the output file
 
-def output_entities(toks, predictions, outf) :
+def entities(toks, predictions) :
     inside = False;
     for k in range(len(predictions)) :
         y = predictions[k]
@@ -24,22 +27,35 @@ def output_entities(toks, predictions, outf) :
             entity_form += " "+form
             entity_end = offE
         elif (y[0]=="O" and inside) :
-            print(sid, entity_start+"-"+entity_end, entity_form, entity_type, sep="|", file=outf)
+            yield sid, entity_start+"-"+entity_end, entity_form, entity_type
             inside = False
 
-    if inside : print(sid, entity_start+"-"+entity_end, entity_form, entity_type, sep="|", file=outf)
+    if inside : yield sid, entity_start+"-"+entity_end, entity_form, entity_type
 
-    
-def predict(datafile, modelfile, outputfile):
+
+# --------------------------------------------------
+# write identified drugs to outf, one per line
+
+def output_entities(toks, predictions, outf) :
+    for e in entities(toks, predictions) :
+        print(*e, sep="|", file=outf)
+
+
+# number of sentences classified at once
+BATCH_SIZE = 5000
+
+## -- n_jobs is the number of processes tagging sentences in parallel
+## -- (only for CRF models, -1: one per core)
+def predict(datafile, modelfile, outputfile, n_jobs=1):
     
     # load data to annotate
-    ds = Dataset(datafile)
+    ds = Dataset(datafile, index=False)
 
     # load trained model to use
     ext = modelfile[-4:].lower()
     if ext == ".mem" : model = MEM(modelfile)
     elif ext == ".svm" : model = SVM(modelfile)
-    elif ext == ".crf" : model = CRF(modelfile)
+    elif ext == ".crf" : model = CRF(modelfile, n_jobs=n_jobs)
     else :
         print(f"Invalid model type '{ext}'")
         sys.exit(1)
@@ -47,17 +63,24 @@ def predict(datafile, modelfile, outputfile):
     # open outfile
     outf = open(outputfile, "w")
     
-    for xseq,_,toks in ds.instances():
-        # process each sentence
-        # each word has a list of features (xseq) for the prediction
-        # plus positional info (toks) to format the output
-
-        # get BIO labels for each word in the sentence
-        predictions = model.predict(xseq)
-        # Convert BIO labels to drugs
-        output_entities(toks, predictions, outf)
+    sentences = ds.instances()
+    try :
+        while True :
+            # process sentences in batches, classifying all words at once.
+            # each word has a list of features (xseq) for the prediction
+            # plus positional info (toks) to format the output
+            batch = list(islice(sentences, BATCH_SIZE))
+            if not batch : break
 
-    outf.close()
+            # get BIO labels for each word in each sentence
+            predictions = model.predict_batch([xseq for xseq,_,_ in batch])
+            # Convert BIO labels to drugs
+            for (_,_,toks), pred in zip(batch, predictions) :
+                output_entities(toks, pred, outf)
+    finally :
+        outf.close()
+        # stop CRF tagging processes, also if something went wrong
+        if isinstance(model, CRF) : model.close()
         
 
     
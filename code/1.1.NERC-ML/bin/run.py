@@ -24,6 +24,10 @@ from dictionaries import Dictionaries
 #    - for CRF: algorithm, feature.minfreq, c1, c2, max_iterations, epsilon
 #               More details about parameters at:
 #               https://sklearn-crfsuite.readthedocs.io/en/latest/api.html
+#    - for CRF early stopping: early_stop, holdout
+#               Evaluate on holdout feature file (default: devel.feat) after
+#               each iteration, and stop when F1 has not improved for
+#               early_stop iterations. The best model is kept.
 #    - for MEM: C, solver, max_iter, n_jobs
 #               More details about parameters at:
 #               https://scikit-learn.org/stable/modules/generated/sklearn.svm.SVC.html
@@ -31,6 +35,25 @@ from dictionaries import Dictionaries
 #    - for SVM: C, kernel, degree, gamma
 #               More details about parameters at: 
 #               https://scikit-learn.org/stable/modules/generated/sklearn.linear_model.LogisticRegression.html
+#    - for SVM fast mode: fast, n_components
+#               fast=linear trains a linear SVM on the sparse features.
+#               fast=nystroem (any kernel) or fast=rff (rbf only) approximate
+#               the kernel with n_components dense features, then train a
+#               linear SVM on them. Much faster than the default kernel SVM.
+#               On our sparse features, fast=linear is usually also the most
+#               accurate; approximations need many components to do well.
+#    - for SVM and MEM: hash_size
+#               Number of buckets to hash features into (signed hashing trick).
+#               If not given, an index of all features is stored with the model.
+#    - for SVM and MEM: minfreq, kbest
+#               Index only features seen in at least minfreq training examples
+#               and, if kbest is given, only the kbest of them with highest
+#               chi-squared score. Not used with hash_size.
+#    - for CRF prediction: n_jobs
+#               Number of processes tagging sentences in parallel (-1: one per core).
+#    - for feature extraction: nlp_batch_size, nlp_n_process
+#               Number of sentences per spaCy batch, and number of processes
+#               used to analyze them.
 #    Omitted parameters will receive a default value
 #    Parametres may be mixed, each model will select its own.
 #
@@ -44,9 +67,15 @@ from dictionaries import Dictionaries
 #      # the 3 lines above can be run in a single one:
 #      python3 run.py extract train predict CRF max_iterations=50
 #
+#      # train a CRF stopping when devel F1 does not improve in 20 iterations
+#      python3 run.py train predict CRF early_stop=20
+#
 #      # Extract train, and evaluate a SVM model (assumig features were already extracted)
 #      python3 run.py train predict SVM C=10 kernel=rbf
 #
+#      # same, approximating the rbf kernel (much faster on large data)
+#      python3 run.py train predict SVM C=10 kernel=rbf fast=nystroem n_components=500
+#
 #      # several models can be trained/evaluated in one command
 #      # The line below will do the same than all the preceeding lines
 #      python3 run.py extract train predict CRF SVM C=10 kernel=rbf max_iterations=50
@@ -66,12 +95,16 @@ for p in sys.argv[1:]:
     if "=" in p:
         par,val = p.split("=")
         params[par] = val
+nlp_batch_size = int(params.get("nlp_batch_size", 64))
+nlp_n_process = int(params.get("nlp_n_process", 1))
+n_jobs = int(params.get("n_jobs", 1))
 
 # if creting dictionaries is required, do it
 if "dicts" in sys.argv[1:] :
    print("Creating dictionaries")
-   dict = Dictionaries()
-   dict.save(os.path.join(paths.RESOURCES,"dictionaries"))
+   # compile resources lexicon, reprocessing only resource files
+   # changed since last time
+   Dictionaries().compile()
 
 # if feature extraction is required, do it
 if "extract" in sys.argv[1:] :
@@ -79,17 +112,20 @@ if "extract" in sys.argv[1:] :
     if "test" in sys.argv[1:] :
         print("Extracting features for test...")
         extract_features(os.path.join(paths.DATA,"test.xml"), 
-                         os.path.join(paths.PREPROCESS,"test.feat"))
+                         os.path.join(paths.PREPROCESS,"test.feat"),
+                         batch_size=nlp_batch_size, n_process=nlp_n_process)
 
     else : # otherwise, extract features for train and devel
         os.makedirs(paths.PREPROCESS, exist_ok=True)
         # convert datasets to feature vectors
         print("Extracting features for train...")
         extract_features(os.path.join(paths.DATA,"train.xml"),
-                         os.path.join(paths.PREPROCESS,"train.feat"))
+                         os.path.join(paths.PREPROCESS,"train.feat"),
+                         batch_size=nlp_batch_size, n_process=nlp_n_process)
         print("Extracting features for devel...")
         extract_features(os.path.join(paths.DATA,"devel.xml"), 
-                         os.path.join(paths.PREPROCESS,"devel.feat"))
+                         os.path.join(paths.PREPROCESS,"devel.feat"),
+                         batch_size=nlp_batch_size, n_process=nlp_n_process)
 
     
 # for each required model, see if training or prediction are required
@@ -111,7 +147,8 @@ for model in ["CRF", "SVM", "MEM"] :
                 print(f"Running {model} model...")
                 predict(os.path.join(paths.PREPROCESS,"test.feat"),
                         os.path.join(paths.MODELS,"model."+model),
-                        os.path.join(paths.RESULTS,"test-"+model+".out"))
+                        os.path.join(paths.RESULTS,"test-"+model+".out"),
+                        n_jobs=n_jobs)
                 evaluate("NER", 
                          os.path.join(paths.DATA,"test.xml"),
                          os.path.join(paths.RESULTS,"test-"+model+".out"),
@@ -122,7 +159,8 @@ for model in ["CRF", "SVM", "MEM"] :
             print(f"Running {model} model...")
             predict(os.path.join(paths.PREPROCESS,"devel.feat"),
                    os.path.join(paths.MODELS,"model."+model),
-                   os.path.join(paths.RESULTS,"devel-"+model+".out"))
+                   os.path.join(paths.RESULTS,"devel-"+model+".out"),
+                   n_jobs=n_jobs)
             evaluate("NER", 
                      os.path.join(paths.DATA,"devel.xml"),
                      os.path.join(paths.RESULTS,"devel-"+model+".out"),
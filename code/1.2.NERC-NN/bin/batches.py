@@ -0,0 +1,94 @@
+
+# Length-bucketed batches of encoded sentences.
+#
+# Sentences are kept unpadded, as flat arrays with one row per token (see
+# Codemaps.encode_flat). Batches group sentences of similar length, and
+# each batch is padded only to its longest sentence, so the network does
+# not run over padding steps. Sentences are never cut.
+#
+# Usage:
+#    lens, X, pads = codes.encode_flat(data, labels=True)
+#    loader = sentence_loader(lens, X, pads, 16, labels=True, shuffle=True)
+#    for ids, (lw, w, s, f, lens, y) in loader : ...
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset, Sampler, DataLoader
+from torch.nn.utils.rnn import pad_sequence
+
+
+#-------------------------------------------
+# Sentences stored as flat arrays. Each item is the sentence number,
+# and a list with the rows of the sentence in each array. If labels is
+# True, the last array holds the labels of each token.
+#-------------------------------------------
+class SentenceTensors(Dataset) :
+
+    ## --------- Constructor: lens = length of each sentence, arrays = list
+    ## --------- of arrays with one row per token, all sentences one after
+    ## --------- the other. pads = padding code for each array.
+    def __init__(self, lens, arrays, pads, labels=False) :
+        self.lens = np.asarray(lens, dtype=np.int64)
+        self.ends = np.cumsum(self.lens)
+        self.arrays = [torch.from_numpy(np.asarray(a)) for a in arrays]
+        self.pads = pads
+        self.labels = labels
+
+    def __len__(self) :
+        return len(self.lens)
+
+    def __getitem__(self, i) :
+        start, end = self.ends[i]-self.lens[i], self.ends[i]
+        return i, [a[start:end] for a in self.arrays]
+
+    ## --------- Pad given sentences to the longest one. Returns the
+    ## --------- sentence numbers, and a (n_sentences, max_length, ...)
+    ## --------- tensor for each array, with the sentence lengths inserted
+    ## --------- before the last one (labels, if present) so they can be
+    ## --------- passed on to the network.
+    def collate(self, batch) :
+        ids = [i for i,_ in batch]
+        batch = [s for _,s in batch]
+        lens = torch.tensor([len(s[0]) for s in batch], dtype=torch.int64)
+        X = [pad_sequence([s[k] for s in batch], batch_first=True,
+                          padding_value=pad).to(torch.int64)
+             for k,pad in enumerate(self.pads)]
+        X.insert(len(X)-1 if self.labels else len(X), lens)
+        return ids, X
+
+
+#-------------------------------------------
+# Batch sampler grouping sentences of similar length. Sentences are
+# sorted by length and split into batches. If shuffle is True, sentences
+# of the same length and batches are visited in a new random order
+# each epoch.
+#-------------------------------------------
+class BucketSampler(Sampler) :
+
+    def __init__(self, lens, batch_size, shuffle=False) :
+        self.lens = np.asarray(lens, dtype=np.int64)
+        self.batch_size = int(batch_size)
+        self.shuffle = shuffle
+
+    def __len__(self) :
+        return (len(self.lens) + self.batch_size - 1) // self.batch_size
+
+    def __iter__(self) :
+        n, bs = len(self.lens), self.batch_size
+        if self.shuffle :
+            perm = torch.randperm(n).numpy()
+            order = perm[np.argsort(self.lens[perm], kind="stable")]
+        else :
+            order = np.argsort(self.lens, kind="stable")
+        batches = [order[i:i+bs].tolist() for i in range(0, n, bs)]
+        if self.shuffle :
+            batches = [batches[i] for i in torch.randperm(len(batches)).tolist()]
+        return iter(batches)
+
+
+## --------- Create a data loader giving length-bucketed batches of
+## --------- the encoded sentences (see SentenceTensors.collate)
+def sentence_loader(lens, arrays, pads, batch_size, labels=False, shuffle=False) :
+    data = SentenceTensors(lens, arrays, pads, labels)
+    return DataLoader(data, batch_sampler=BucketSampler(lens, batch_size, shuffle),
+                      collate_fn=data.collate)
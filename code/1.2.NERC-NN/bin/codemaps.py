@@ -1,17 +1,22 @@
 import os
 import string
 import re
-import torch
+from array import array
+from functools import lru_cache
+import numpy as np
 
+import paths
+from lexicon import Lexicon
 from dataset import *
 
-# folder where this file is located
-THISDIR=os.path.abspath(os.path.dirname(__file__))
-# go two folders up and locate "resources" folder there
-NERDIR=os.path.dirname(THISDIR)
-SOLDIR=os.path.dirname(NERDIR)
-MAINDIR=os.path.dirname(SOLDIR)
-RESOURCESDIR=os.path.join(MAINDIR, "resources")
+# number of binary features for each word (see Codemaps.form_features)
+N_FEATURES = 16
+# number of unknown word forms whose features are kept
+OOV_CACHE_SIZE = 4096
+# external lexicon used for features: HSDB entries have type "any",
+# and names are split on whitespace
+LEXICON = dict(sources=["HSDB.txt","DrugBank.txt"], hsdb_type="any",
+               tokenizer="split", resources=paths.RESOURCES)
 
 class Codemaps :
     # --- constructor, create mapper either from training data, or
@@ -20,32 +25,8 @@ class Codemaps :
         maxlen = params['max_len'] if 'max_len' in params else None
         suflen = params['suf_len'] if 'suf_len' in params else None
         
-        #----------------------
-        self.external = {}
-        self.externalpart = {}
-        with open(os.path.join(RESOURCESDIR,"HSDB.txt"),encoding='utf-8') as h :
-            for x in h.readlines() :
-                x = x.strip().lower()
-                self.external[x] = {"any"}
-                wds = x.split()
-                if len(wds)>1 :
-                   for w in wds:
-                       self.externalpart[w] = {"any"}
-                                
-        with open(os.path.join(RESOURCESDIR,"DrugBank.txt"),encoding='utf-8') as h :
-            for x in h.readlines() :
-                (n,t) = x.strip().lower().split("|")
-                if n in self.external : self.external[n].add(t)
-                else: self.external[n] = {t}
-                wds = n.split()
-                if len(wds)>1 :
-                   for w in wds:
-                       if w in self.externalpart :
-                          self.externalpart[w].add(t)
-                       else :
-                          self.externalpart[w] = {t}
-                                
-        #----------------------
+        # external lexicon, loaded only when first needed
+        self.lexicon = Lexicon(**LEXICON)
                 
         if isinstance(data,Dataset) and maxlen is not None and suflen is not None:
             self.__create_indexs(data, maxlen, suflen)
@@ -61,6 +42,9 @@ class Codemaps :
             print(f'codemaps: Missing max_len and/or suf_len parameters in constructor. params={params}')
             exit()
 
+        self.__create_feature_table()
+        self.__create_label_names()
+
             
     # --------- Create indexs from training data
     # Extract all words and labels in given sentences and 
@@ -130,58 +114,48 @@ class Codemaps :
             for key in self.suf_index : print('SUF', key, self.suf_index[key], file=f)
 
 
-    ## --------- Pad tensors for short sentences and cut sentences longer 
-    ## --------- than maxlen, so all sentences have the same length.
-    ## --------- Return a tensor with all the sentences.
-    ## --------- Given tensor_list is assumed to have one tensor per sentence.
-    ## --------- Each sentence tensors has :
-    ## ---------    1nd dimension = n_words in the sentence
-    ## ---------    2nd dimension (if any) = n_feature bits for each word
-    def cut_and_pad(self, tensor_list, pad) :
-        # check if the tensors are 1d or 2d, and decide shape of output tensor 
-        if len(tensor_list[0].shape)==1 : 
-           shape = (len(tensor_list), self.maxlen)
-        elif len(tensor_list[0].shape)==2 : 
-           shape = (len(tensor_list), self.maxlen, tensor_list[0].shape[1])
-        # cut sentences longer than maxlen
-        tensor_list = [s[0:self.maxlen] for s in tensor_list]
-        # create a tensor full of padding with the final desired shape
-        padded = torch.Tensor([]).new_full(shape, pad, dtype=torch.int64)        
-        # fill padded tensor with given data, leaving padding in unused spaces
-        for i,s in enumerate(tensor_list):
-           for j,f in enumerate(tensor_list[i]) :
-              padded[i,j] = f
-        return padded
-    
-    ## --------- encode X from given data ----------- 
-    def encode_words(self, data) :
-
-        #----- encode sentence words
-        enc = [torch.Tensor([self.word_index[w.text] if w.text in self.word_index else self.word_index['UNK'] for w in s]) for _,s,_ in data.sentences()]
-        Xw = self.cut_and_pad(enc, self.word_index['PAD'])
-
-        #------ encode sentence lowercase words
-        enc = [torch.Tensor([self.lc_word_index[w.text.lower()] if w.text.lower() in self.lc_word_index else self.lc_word_index['UNK'] for w in s]) for _,s,_ in data.sentences()]
-        Xlw = self.cut_and_pad(enc, self.lc_word_index['PAD'])
-        
-        #------ encode sentence suffixes
-        enc = [torch.Tensor([self.suf_index[w.text.lower()[-self.suflen:]] if w.text.lower()[-self.suflen:] in self.suf_index else self.suf_index['UNK'] for w in s]) for _,s,_ in data.sentences()]
-        Xs = self.cut_and_pad(enc, self.suf_index['PAD'])
-
-        #------ encode word features
-        enc = [torch.Tensor([self.features(w) for w in s]) for _,s,_ in data.sentences()]
-        Xf = self.cut_and_pad(enc, 0)
-
-        # return encoded sequences
-        return [Xlw,Xw,Xs,Xf]
-
-    
-    ## --------- encode Y from given data ----------- 
-    def encode_labels(self, data) :
-        # encode and pad sentence labels
-        enc = [torch.Tensor([self.label_index[lab] for lab in l]) for _,_,l in data.sentences()]
-        Y = self.cut_and_pad(enc, self.label_index['PAD'])
-        return Y
+    ## --------- Encode all tokens in given data in a single pass.
+    ## --------- Returns the length of each sentence, and the codes of all
+    ## --------- tokens in all sentences, one after the other: lowercased
+    ## --------- word, word, suffix (int32 arrays), features (uint8 matrix,
+    ## --------- one row per token) and, if required, labels (int32)
+    def __encode_tokens(self, data, labels=False) :
+        wi, lwi, si, li = self.word_index, self.lc_word_index, self.suf_index, self.label_index
+        w_unk, lw_unk, s_unk = wi['UNK'], lwi['UNK'], si['UNK']
+        suflen = self.suflen
+        lens = array("q")
+        codes = {k : array("i") for k in ["lw", "w", "s", "y"]}
+        oov = [] # (position, form) of unknown words
+        for _,tokens,labs in data.sentences() :
+            lens.append(len(tokens))
+            for t in tokens :
+                form = t.text
+                lcform = form.lower()
+                code = wi.get(form, w_unk)
+                if code == w_unk : oov.append((len(codes["w"]), form))
+                codes["w"].append(code)
+                codes["lw"].append(lwi.get(lcform, lw_unk))
+                codes["s"].append(si.get(lcform[-suflen:], s_unk))
+            if labels : codes["y"].extend([li[lab] for lab in labs])
+
+        codes = {k : np.frombuffer(v, dtype=np.int32) for k,v in codes.items()}
+        # features of known words from the table, others from the cache
+        feats = self.feature_table[codes["w"]]
+        for k,form in oov : feats[k] = self.oov_features(form)
+        return np.frombuffer(lens, dtype=np.int64), codes, feats
+
+    ## --------- encode X (and Y, if labels is True) from given data without
+    ## --------- padding or cutting sentences. Returns the length of each
+    ## --------- sentence, a list of arrays with one row per token
+    ## --------- [lw, w, s, f (, y)], and the padding code for each array.
+    def encode_flat(self, data, labels=False) :
+        lens, codes, feats = self.__encode_tokens(data, labels=labels)
+        X = [codes["lw"], codes["w"], codes["s"], feats]
+        pads = [self.lc_word_index['PAD'], self.word_index['PAD'], self.suf_index['PAD'], 0]
+        if labels :
+            X.append(codes["y"])
+            pads.append(self.label_index['PAD'])
+        return lens, X, pads
 
     ## -------- get word index size ---------
     def get_n_words(self) :
@@ -212,40 +186,53 @@ class Codemaps :
         return self.label_index[l]
     ## -------- get label name for given index --------
     def idx2label(self, i) :
-        for l in self.label_index :
-            if self.label_index[l] == i:
-                return l
-        raise KeyError
+        return self.label_names[int(i)]
+    ## -------- get label names for a tensor of indexes, as nested lists --------
+    def idx2labels(self, idx) :
+        return self.label_names[idx.cpu().numpy()].tolist()
+
+    ## -------- create inverse label index: array with the name of each label code
+    def __create_label_names(self) :
+        self.label_names = np.empty(max(self.label_index.values())+1, dtype=object)
+        for l,i in self.label_index.items() : self.label_names[i] = l
 
-    ## -------- create vector with binary features (used by encode_words)
+    ## -------- create vector with binary features for given token
     def features(self,w) :
-        f = [0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0]
-        if w is not None :
-            form = w.text
-            if form.isupper(): f[0] = 1
-            if form.istitle(): f[1] = 1
-            if form.isdigit(): f[2] = 1
-            if '-' in form:    f[3] = 1
-            if re.search('[0-9]',form): f[4] = 1
-            if any([c in string.punctuation for c in form]): f[5] = 1
-
-            lcform = w.text.lower()
-            if lcform in self.external :
-                if 'drug' in self.external[lcform] : f[6] = 1
-                if 'group' in self.external[lcform] : f[7] = 1
-                if 'brand' in self.external[lcform] : f[8] = 1
-                if 'drug_n' in self.external[lcform] : f[9] = 1
-                if 'any' in self.external[lcform] : f[10] = 1
-            if lcform in self.externalpart :
-                if 'drug' in self.externalpart[lcform] : f[11] = 1
-                if 'group' in self.externalpart[lcform] : f[12] = 1
-                if 'brand' in self.externalpart[lcform] : f[13] = 1
-                if 'drug_n' in self.externalpart[lcform] : f[14] = 1
-                if 'any' in self.externalpart[lcform] : f[15] = 1
+        return list(self.form_features(w.text)) if w is not None else [0]*N_FEATURES
+
+    ## -------- binary features of given word form, as a tuple
+    def form_features(self, form) :
+        f = [0]*N_FEATURES
+        if form.isupper(): f[0] = 1
+        if form.istitle(): f[1] = 1
+        if form.isdigit(): f[2] = 1
+        if '-' in form:    f[3] = 1
+        if re.search('[0-9]',form): f[4] = 1
+        if any([c in string.punctuation for c in form]): f[5] = 1
+
+        lcform = form.lower()
+        external = self.lexicon.external
+        externalpart = self.lexicon.externalpart
+        if lcform in external :
+            if 'drug' in external[lcform] : f[6] = 1
+            if 'group' in external[lcform] : f[7] = 1
+            if 'brand' in external[lcform] : f[8] = 1
+            if 'drug_n' in external[lcform] : f[9] = 1
+            if 'any' in external[lcform] : f[10] = 1
+        if lcform in externalpart :
+            if 'drug' in externalpart[lcform] : f[11] = 1
+            if 'group' in externalpart[lcform] : f[12] = 1
+            if 'brand' in externalpart[lcform] : f[13] = 1
+            if 'drug_n' in externalpart[lcform] : f[14] = 1
+            if 'any' in externalpart[lcform] : f[15] = 1
         
-        return f
-
-
-
-
-
+        return tuple(f)
+
+    ## -------- create table with binary features of each known word
+    ## -------- form, one row per word code (PAD and UNK rows are zero).
+    ## -------- Unknown forms get their features from a small cache.
+    def __create_feature_table(self) :
+        self.feature_table = np.zeros((len(self.word_index), N_FEATURES), dtype=np.uint8)
+        for w,i in self.word_index.items() :
+            if i > 1 : self.feature_table[i] = self.form_features(w)
+        self.oov_features = lru_cache(maxsize=OOV_CACHE_SIZE)(self.form_features)
@@ -1,13 +1,16 @@
 import os, sys
-from xml.dom.minidom import parse
 import pickle
 import torch
 import spacy
 
+import paths
+import corpus
+from analysis_cache import AnalysisCache
+
 class Dataset:
     ##  Parse all XML files in given dir, and load a list of sentences.
     ##  Each sentence is a list of tuples (word, start, end, tag)
-    def __init__(self, filename) :
+    def __init__(self, filename, batch_size=64, n_process=1) :
         if filename[-4:] == ".pck" :
             # parameter is a pickle file, load it
             with open(filename, "rb") as pf:
@@ -16,27 +19,22 @@ class Dataset:
         else : # parameter should be an XML file, load it
             # create spacy Pos Tagger & lemmatizer
             if torch.cuda.is_available() : spacy.require_gpu()
-            nlp = spacy.load("en_core_web_trf")
+            nlp = AnalysisCache("en_core_web_trf")
             self.data = {}
-            # parse XML file, obtaining a DOM tree
-            tree = parse(filename)
-            # process each sentence in the file
-            sentences = tree.getElementsByTagName("sentence")
-            for s in sentences :
-                sid = s.attributes["id"].value   # get sentence id
-                stext = s.attributes["text"].value   # get sentence text
+            # process each sentence in the file, converting texts to lists of tokens
+            # in batches, and keeping each sentence record attached to its tokens
+            sentences = ((s["text"], s) for s in corpus.sentences(filename))
+            for tokens, s in nlp.pipe(sentences, batch_size=batch_size, n_process=n_process) :
+                sid = s["id"]   # get sentence id
+                stext = s["text"]   # get sentence text
                 print(f"parsing sentence {sid}        \r", end="")
-                entities = s.getElementsByTagName("entity")
                 spans = []
-                for e in entities :
+                for e in s["entities"] :
                     # for discontinuous entities, we only get the first span
                     # (will not work, but there are few of them)
-                    (start,end) = e.attributes["charOffset"].value.split(";")[0].split("-")
-                    typ =  e.attributes["type"].value
-                    spans.append((int(start),int(end),typ))
+                    (start,end) = e["spans"][0]
+                    spans.append((start,end,e["type"]))
 
-                # convert the sentence to a list of tokens
-                tokens = nlp(stext)
                 # add gold label to each token, and store it in self.data
                 self.data[sid] = {'stext': stext, 'tokens': tokens, 'labels': []}
                 for tk in tokens :
@@ -45,6 +43,9 @@ class Dataset:
                     # store gold standard tag for this token
                     self.data[sid]['labels'].append(self.__get_label(tks,tke,spans))
 
+            # store new analyses for later runs
+            nlp.save()
+
  
     ## --------- get label ----------- 
     ##  Find out whether given token is marked as part of an entity in the XML
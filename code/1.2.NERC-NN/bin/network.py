@@ -2,9 +2,11 @@
 import torch
 import torch.nn as nn
 import torch.nn.functional as func
+from torch.nn.utils.rnn import pack_padded_sequence, pad_packed_sequence
 
 
-criterion = nn.CrossEntropyLoss()
+# padding positions (label code 0) do not count in the loss
+criterion = nn.CrossEntropyLoss(ignore_index=0)
 
 class nercLSTM(nn.Module):
    def __init__(self, codes, hyperparams) :
@@ -38,7 +40,9 @@ class nercLSTM(nn.Module):
       self.linear = nn.Linear(2*lstm_out_size, linear_out_size)
       self.out = nn.Linear(linear_out_size, n_labels)
 
-   def forward(self, lw, w, s, f):
+   # lens (optional) = actual length of each sentence in the batch.
+   # If given, the LSTM skips the padding after each sentence.
+   def forward(self, lw, w, s, f, lens=None):
       x = self.embLW(lw)
       y = self.embW(w)
       z = self.embS(s)
@@ -47,7 +51,11 @@ class nercLSTM(nn.Module):
       z = self.dropS(z)
 
       x = torch.cat((x, y, z, f), dim=2)
-      x = self.lstm(x)[0]
+      if lens is None :
+         x = self.lstm(x)[0]
+      else :
+         x = pack_padded_sequence(x, lens.cpu().clamp(min=1), batch_first=True, enforce_sorted=False)
+         x = pad_packed_sequence(self.lstm(x)[0], batch_first=True, total_length=lw.shape[1])[0]
 
       activation = self.activation.lower()
       if activation == 'relu':
@@ -4,10 +4,10 @@ import sys
 from os import system
 
 import torch
-from torch.utils.data import TensorDataset, DataLoader
 
 from dataset import *
 from codemaps import *
+from batches import sentence_loader
 
 # use gpu if available
 used_device = "cuda:0" if torch.cuda.is_available() else "cpu"
@@ -22,7 +22,7 @@ def output_entities(data, preds, codes, outfile) :
    for sid,tags in zip(data.sentence_ids(),preds) :
       inside = False
       text,tokens = data.get_sentence_text(sid), data.get_sentence_tokens(sid)
-      for k in range(0, min(len(tokens),codes.maxlen)) :
+      for k in range(0, len(tokens)) :
          y = tags[k]
          tk = tokens[k]
             
@@ -42,11 +42,11 @@ def output_entities(data, preds, codes, outfile) :
    outf.close()
 
 #----------------------------------------------
+# Batches group sentences of similar length, each one padded to its
+# longest sentence (see batches.py)
 def encode_dataset(ds, codes, params) :
-   X = codes.encode_words(ds)
-   if used_device == "cuda:0" :
-      X = [x.to(torch.device(used_device)) for x in X]
-   return DataLoader(TensorDataset(*X), params["batch_size"])
+   lens, X, pads = codes.encode_flat(ds)
+   return sentence_loader(lens, X, pads, params["batch_size"])
 
 
 #----------------------------------------------
@@ -63,10 +63,15 @@ def predict(modelname, datafile, params, outfile) :
     testdata = Dataset(datafile)
     test_loader = encode_dataset(testdata, codes, params)
 
-    Y = []
-    for X in test_loader:
-       y = model.forward(*X)
-       Y.extend([[codes.idx2label(torch.argmax(w)) for w in s] for s in y] )
+    Y = [None]*len(test_loader.dataset)
+    with torch.no_grad() :
+       # batches are not in data order, put results back in place
+       for idx, X in test_loader:
+          X = [x.to(torch.device(used_device)) for x in X]
+          y = model.forward(*X)
+          # best label for each word in the batch, decoded all at once
+          for i, tags in zip(idx, codes.idx2labels(y.argmax(dim=-1))) :
+             Y[i] = tags
 
     # extract & evaluate entities with basic model
     output_entities(testdata, Y, codes, outfile)
@@ -14,10 +14,16 @@ from predict import predict
 #  You can select wich steps of the experiment execcute:
 #    - parse: Use spaccy to parse the documents and store results in pickle files
 #    - train: Train a NN model
+#      Encoded datasets are cached (project "cache" folder), so further
+#      trainings on the same data and max_len/suf_len start right away.
 #    - predict: Apply the model to development data set and evaluate performance
 #
 #  You can add hyperparameters for training
 #    - batch_size, max_len, suf_len
+#    Sentences are not cut to max_len: batches group sentences of
+#    similar length, and each batch is padded to its longest one.
+#  and parameters for spaCy parsing
+#    - nlp_batch_size, nlp_n_process
 #    Omitted parameters will receive a default value
 #    Parametres may be mixed, each model will select its own.
 #
@@ -49,6 +55,8 @@ for p in sys.argv[1:]:
     if "=" in p:
         par,val = p.split("=")
         params[par] = val
+nlp_batch_size = int(params.get("nlp_batch_size", 64))
+nlp_n_process = int(params.get("nlp_n_process", 1))
         
 if "name" not in params: params["name"]="mymodel_000"
 
@@ -73,17 +81,20 @@ if "parse" in sys.argv[1:] :
     if "test" in sys.argv[1:] : 
         os.makedirs(os.path.join(NERDIR, "preprocessed"), exist_ok=True)
         print("Creating parsed test pickle file...         ")
-        ds = Dataset(os.path.join(DATADIR,"test.xml"))
+        ds = Dataset(os.path.join(DATADIR,"test.xml"),
+                     batch_size=nlp_batch_size, n_process=nlp_n_process)
         ds.save(os.path.join(NERDIR, "preprocessed","test.pck"))
 
     else : # otherwise, extract features for train and devel
         os.makedirs(os.path.join(NERDIR, "preprocessed"), exist_ok=True)
         # convert datasets to feature vectors
         print("Creating parsed train pickle file...         ")
-        ds = Dataset(os.path.join(DATADIR,"train.xml"))
+        ds = Dataset(os.path.join(DATADIR,"train.xml"),
+                     batch_size=nlp_batch_size, n_process=nlp_n_process)
         ds.save(os.path.join(NERDIR, "preprocessed","train.pck"))
         print("Creating parsed devel pickle file...         ")
-        ds = Dataset(os.path.join(DATADIR,"devel.xml"))
+        ds = Dataset(os.path.join(DATADIR,"devel.xml"),
+                     batch_size=nlp_batch_size, n_process=nlp_n_process)
         ds.save(os.path.join(NERDIR, "preprocessed","devel.pck"))
 
     
@@ -5,12 +5,14 @@ import random
 
 import torch
 import torch.nn as nn
-from torch.utils.data import TensorDataset, DataLoader
 import torch.optim as optim
 from torchinfo import summary
 
+import paths
 from dataset import *
 from codemaps import *
+from batches import sentence_loader
+from encoding_cache import EncodingCache
 
 from network import nercLSTM, criterion
 
@@ -30,7 +32,8 @@ def train(network, epoch, train_loader):
    network.train()
    seen = 0
    acc_loss = 0
-   for batch_idx, X in enumerate(train_loader):
+   for batch_idx, (_, X) in enumerate(train_loader):
+      X = [x.to(torch.device(used_device)) for x in X]
       target = X.pop()
       optimizer.zero_grad()
       output = network(*X)
@@ -58,15 +61,18 @@ def validation(network, val_loader):
     correct = 0
     total = 0
     with torch.no_grad():
-       for X in val_loader:
+       for _, X in val_loader:
+          X = [x.to(torch.device(used_device)) for x in X]
           target = X.pop()
           output = network(*X)
           output = output.flatten(0,1)
           target = target.flatten(0,1)
           test_loss += criterion(output, target).item()
-          pred = output.data.max(1, keepdim=True)[1]
-          correct += pred.eq(target.data.view_as(pred)).sum()
-          total += target.size()[0]
+          # accuracy over actual words, not padding
+          words = target != 0
+          pred = output.data.max(1)[1]
+          correct += pred[words].eq(target[words]).sum()
+          total += words.sum()
     test_loss /= len(val_loader)
     acc = 100.*correct/total
     print('Validation set: Avg. loss: {:.4f}, Accuracy: {}/{} ({:.2f}%)'.format(
@@ -75,15 +81,23 @@ def validation(network, val_loader):
                acc))
     return acc
 
+# names of the encoded arrays, in the order given by Codemaps.encode_flat
+ARRAYS = ["lw", "w", "s", "f", "y"]
+
 #----------------------------------------------
-def encode_dataset(ds, codes, params) :
-   X = codes.encode_words(ds)
-   y = codes.encode_labels(ds)
-   if used_device == "cuda:0" :
-      X = [x.to(torch.device(used_device)) for x in X]
-      y = y.to(torch.device(used_device))
-   return DataLoader(TensorDataset(*X, y), 
-                     batch_size=params['batch_size'])
+# Encode given dataset and store it in given cache entry under given
+# name: the arrays, and their padding codes
+def encode_dataset(ds, codes, entry, name) :
+   lens, X, pads = codes.encode_flat(ds, labels=True)
+   entry.save(name, dict(zip(["lens"]+ARRAYS, [lens]+X)), {"pads" : pads})
+
+#----------------------------------------------
+# Batches group sentences of similar length, each one padded to its
+# longest sentence (see batches.py). Training batches are shuffled.
+def data_loader(encoded, params, shuffle=False) :
+   arrays, meta = encoded
+   return sentence_loader(arrays["lens"], [arrays[k] for k in ARRAYS], meta["pads"],
+                          params['batch_size'], labels=True, shuffle=shuffle)
 
 
 #----------------------------------------------
@@ -95,15 +109,38 @@ def do_train(trainfile, valfile, params, modelname) :
     if 'batch_size' not in params : params['batch_size'] = 16
     if 'epochs' not in params : params['epochs'] = 10
 
-    # load pickle datasets (or parse if needed)
-    traindata = Dataset(trainfile)
-    valdata = Dataset(valfile)
-
-    # create indexes from training data
-    codes  = Codemaps(traindata, params)
-    # encode datasets
-    train_loader = encode_dataset(traindata, codes, params)
-    val_loader = encode_dataset(valdata, codes, params)
+    # encoded datasets and codemaps are cached, runs with the same data,
+    # encoding code, lexicon, and encoding parameters skip loading and
+    # encoding. max_len is not part of the key: sentences are not cut
+    # (see batches.py), so it does not change the encoding.
+    cache = EncodingCache(os.path.basename(paths.CLASSIFIER),
+                          [trainfile, valfile, sys.modules[Codemaps.__module__].__file__],
+                          {'suf_len' : params['suf_len'],
+                           'lexicon' : Lexicon(**LEXICON).digest})
+    if not cache.exists() :
+       with cache.build() as entry :
+          # load pickle datasets (or parse if needed)
+          traindata = Dataset(trainfile)
+          valdata = Dataset(valfile)
+
+          # create indexes from training data
+          codes  = Codemaps(traindata, params)
+          codes.save(entry.path("codemaps"))
+          # encode datasets
+          encode_dataset(traindata, codes, entry, "train")
+          encode_dataset(valdata, codes, entry, "devel")
+
+    # load codemaps and datasets from the complete cache entry, so they
+    # match even if another run created it at the same time
+    print(f"Using encoded datasets cached in {cache.cachedir}")
+    codes = Codemaps(cache.path("codemaps"), {})
+    # max_len is not in the cache key, keep this run's one in the
+    # codemaps saved with the model
+    codes.maxlen = params['max_len']
+    train_enc, val_enc = cache.load("train"), cache.load("devel")
+
+    train_loader = data_loader(train_enc, params, shuffle=True)
+    val_loader = data_loader(val_enc, params)
 
     # build network
     network = nercLSTM(codes, params)
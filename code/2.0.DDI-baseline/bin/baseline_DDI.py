@@ -3,8 +3,10 @@
 import sys
 import re
 import os
-from xml.dom.minidom import parse
-import spacy
+
+import paths
+import corpus
+from analysis_cache import AnalysisCache
 
 wib = { "effect" : ["alcohol", "response", "enhance", "action",
                     "central", "additive", "nervous", "man", "block",
@@ -39,47 +41,39 @@ def check_interaction(tokens, entities, e1, e2) :
          
    
 ## --------- DDI extractor baseline ----------- 
-def DDI_baseline(datafile, outfile) :
+def DDI_baseline(datafile, outfile, batch_size=64, n_process=1) :
    outf = open(outfile, "w")
    
    # create tokenizer
-   nlp = spacy.load("en_core_web_trf", enable=["tokenizer","tagger","attribute_ruler","lemmatizer"])
-   
-   # parse XML file, obtaining a DOM tree
-   tree = parse(datafile)
+   nlp = AnalysisCache("en_core_web_trf", enable=["tokenizer","tagger","attribute_ruler","lemmatizer"])
    
-   # process each sentence in the file
-   sentences = tree.getElementsByTagName("sentence")
-   for s in sentences :
-      sid = s.attributes["id"].value   # get sentence id
-      stext = s.attributes["text"].value   # get sentence text
+   # process each sentence in the file, analyzing texts in batches
+   # and keeping each sentence record attached to its tokens
+   sentences = ((s["text"], s) for s in corpus.sentences(datafile))
+   for tokens, s in nlp.pipe(sentences, batch_size=batch_size, n_process=n_process) :
+      sid = s["id"]   # get sentence id
       print(f"processing sentence {sid}        \r", end="")
-      
-      # tokenize text with spacy tokenizer
-      tokens = nlp(stext)
         
       # load sentence entities
       entities = {}
-      ents = s.getElementsByTagName("entity")
-      for e in ents :
-         id = e.attributes["id"].value
-         offs = e.attributes["charOffset"].value.split("-")           
-         entities[id] = {'start': int(offs[0]),
-                         'end': int(offs[-1]),
-                         'type': e.attributes["type"].value,
-                         'text': e.attributes["text"].value}
+      for e in s["entities"] :
+         # discontinuous entities cover from the first span start to the last span end
+         entities[e["id"]] = {'start': e["spans"][0][0],
+                              'end': e["spans"][-1][1],
+                              'type': e["type"],
+                              'text': e["text"]}
            
       # for each pair in the sentence, decide whether it is DDI and its type
-      pairs = s.getElementsByTagName("pair")      
-      for p in pairs:
-         id_e1 = p.attributes["e1"].value
-         id_e2 = p.attributes["e2"].value
+      for p in s["pairs"]:
+         id_e1 = p["e1"]
+         id_e2 = p["e2"]
            
          ddi_type = check_interaction(tokens, entities, id_e1, id_e2)
          if ddi_type is not None :
             print("|".join([sid, id_e1, id_e2, ddi_type]), file=outf)
            
    outf.close()
+   nlp.save()
         
         
 ## --------- MAIN PROGRAM ----------- 
@@ -7,11 +7,22 @@ import paths
 sys.path.append(paths.UTIL)
 from evaluator import evaluate
 
+# extract spaCy batching parameters from command line.
+#   e.g.  python3 run.py nlp_batch_size=128 nlp_n_process=4
+params = {}
+for p in sys.argv[1:]:
+    if "=" in p:
+        par,val = p.split("=")
+        params[par] = val
+batch_size = int(params.get("nlp_batch_size", 64))
+n_process = int(params.get("nlp_n_process", 1))
+
 os.makedirs(paths.RESULTS, exist_ok=True)
 for ds in ["devel", "test"]:
    print(f"Running baseline on {ds}                   ")
    DDI_baseline(os.path.join(paths.DATA,f"{ds}.xml"), 
-                os.path.join(paths.RESULTS,f"{ds}.out"))
+                os.path.join(paths.RESULTS,f"{ds}.out"),
+                batch_size, n_process)
    print(f"Evaluating baseline on {ds}                ")
    evaluate("DDI",
             os.path.join(paths.DATA,f"{ds}.xml"),
@@ -5,10 +5,9 @@ import sys
 import pickle
 
 import scipy
-import sklearn
-from sklearn.linear_model import LogisticRegression
 
 import dataset
+import linear_model
 
 
 class MEM:
@@ -21,10 +20,15 @@ class MEM:
         self.modelfile = modelfile
         if params is None:
             # only modelfile given, assume it is an existing model and load it        
-            with open(self.modelfile, 'rb') as df :
-                self.tagger = pickle.load(df)
-            with open(self.modelfile+".idx", 'rb') as df :
-                self.fidx = pickle.load(df)
+            if linear_model.is_linear_model(self.modelfile) :
+                # compact model, it encodes features itself
+                self.tagger = self.fidx = linear_model.LinearModel(self.modelfile)
+            else :
+                # old pickled sklearn model and feature index
+                with open(self.modelfile, 'rb') as df :
+                    self.tagger = pickle.load(df)
+                with open(self.modelfile+".idx", 'rb') as df :
+                    self.fidx = pickle.load(df)
                 
         else :
             # params given, create new empty model
@@ -34,8 +38,16 @@ class MEM:
             C = float(params['C']) if 'C' in params else 1.0
             solver = params['solver'] if 'solver' in params else 'lbfgs'
             maxit = params['max_iter'] if 'max_iter' in params else 1500
+            # number of buckets for feature hashing. If not given, features are indexed
+            hash_size = int(params['hash_size']) if 'hash_size' in params else None
+            self.hasher = dataset.feature_hasher(hash_size) if hash_size else None
+            # indexed feature pruning: minimum frequency, and number of features
+            # to keep by chi-squared selection (all, if not given)
+            self.minfreq = int(params['minfreq']) if 'minfreq' in params else 1
+            self.kbest = int(params['kbest']) if 'kbest' in params else None
 
             # create and train empty classifier with given parameters
+            from sklearn.linear_model import LogisticRegression
             self.tagger = LogisticRegression(verbose=1,
                                              C=C,
                                              solver=solver,
@@ -47,7 +59,8 @@ class MEM:
     ## --------------------------------------------------
     def train(self, datafile):
         # load dataset
-        ds = dataset.Dataset(datafile)
+        ds = dataset.Dataset(datafile, hasher=self.hasher,
+                             minfreq=self.minfreq, kbest=self.kbest)
         self.fidx = ds.feature_index()
 
         # Read training instances 
@@ -56,27 +69,26 @@ class MEM:
         # train classifier
         self.tagger.fit(X,Y)
 
-        # save model
-        pickle.dump(self.tagger, open(self.modelfile, 'wb'))
-        pickle.dump(self.fidx, open(self.modelfile+".idx", 'wb'))
+        # save model weights and feature index in compact format
+        linear_model.save(self.modelfile, self.tagger.classes_,
+                          self.tagger.coef_, self.tagger.intercept_, self.fidx)
     
 
     ## --------------------------------------------------
     ## predict best class for given example
     ## --------------------------------------------------
     def predict(self, x):
-        # Encode xseq into a CSR sparse matrix
-        rowi = [] # row (example number)
-        colj = [] # column (feature number)
-        data = [] # value (1 or 0 since we use binary features)
-        for f in x :
-            if f in self.fidx :
-                data.append(1)
-                rowi.append(0) # we are labeling only one example
-                colj.append(self.fidx[f]) 
-            
-        X = scipy.sparse.csr_matrix((data, (rowi, colj)), shape=(1,len(self.fidx)))
+        # Encode x into a CSR sparse matrix
+        X = dataset.encode([x], self.fidx)
         
         # apply model to X and return predictions
         return self.tagger.predict(X)
 
+
+    ## --------------------------------------------------
+    ## predict best class for each example in xs.
+    ## All examples are encoded and classified at once.
+    ## --------------------------------------------------
+    def predict_batch(self, xs):
+        if len(xs)==0 : return []
+        return self.tagger.predict(dataset.encode(xs, self.fidx))
@@ -35,7 +35,14 @@ class SVM:
             kernel = params['kernel'] if 'kernel' in params else 'rbf'
             degree = int(params['degree']) if 'degree' in params else 3
             gamma = float(params['gamma']) if 'gamma' in params else 'scale'
-                
+            # number of buckets for feature hashing. If not given, features are indexed
+            hash_size = int(params['hash_size']) if 'hash_size' in params else None
+            self.hasher = dataset.feature_hasher(hash_size) if hash_size else None
+            # indexed feature pruning: minimum frequency, and number of features
+            # to keep by chi-squared selection (all, if not given)
+            self.minfreq = int(params['minfreq']) if 'minfreq' in params else 1
+            self.kbest = int(params['kbest']) if 'kbest' in params else None
+
             # create classifier
             self.tagger = SVC(verbose=True,
                               C=C,
@@ -50,7 +57,8 @@ class SVM:
     ## --------------------------------------------------
     def train(self, datafile):
         # load dataset
-        ds = dataset.Dataset(datafile)
+        ds = dataset.Dataset(datafile, hasher=self.hasher,
+                             minfreq=self.minfreq, kbest=self.kbest)
         self.fidx = ds.feature_index()
 
         # Read training instances 
@@ -69,16 +77,16 @@ class SVM:
     ## --------------------------------------------------
     def predict(self, x):
         # Encode x into a CSR sparse matrix
-        rowi = [] # row (example number)
-        colj = [] # column (feature number)
-        data = [] # value (1 or 0 since we use binary features)
-        for f in x :
-            if f in self.fidx :
-                data.append(1)
-                rowi.append(0) # we are predicting a single example
-                colj.append(self.fidx[f])
-                
-        X = scipy.sparse.csr_matrix((data, (rowi, colj)), shape=(1,len(self.fidx)))
+        X = dataset.encode([x], self.fidx)
         
         # apply model to X and return predictions
         return self.tagger.predict(X)
+
+
+    ## --------------------------------------------------
+    ## predict best class for each example in xs.
+    ## All examples are encoded and classified at once.
+    ## --------------------------------------------------
+    def predict_batch(self, xs):
+        if len(xs)==0 : return []
+        return self.tagger.predict(dataset.encode(xs, self.fidx))
@@ -1,50 +1,161 @@
 
+from array import array
+import numpy as np
 import scipy
 
+import paths
+from featfile import FeatFile, is_featfile
+
+
+## ------ create a feature hasher with given number of buckets. Features
+## ------ are hashed with alternating signs, so collisions tend to cancel out.
+def feature_hasher(n_buckets) :
+    from sklearn.feature_extraction import FeatureHasher
+    return FeatureHasher(n_features=n_buckets, input_type="string", alternate_sign=True)
+
+## ------ encode a list of examples (each a list of string features) as a
+## ------ sparse matrix, using given feature index: either a dictionary
+## ------ feature->column, or an object encoding them with a transform
+## ------ method (a FeatureHasher, or a linear_model.LinearModel).
+## ------ Unknown features are ignored.
+def encode(examples, fidx) :
+    if hasattr(fidx, "transform") :
+        return fidx.transform(examples)
+
+    # column of each known feature (CSR indices), and where each
+    # example starts (CSR indptr). Values are 1 (binary features)
+    indices = array("i")
+    indptr = array("i", [0])
+    col = fidx.get
+    for w in examples :
+        indices.extend([j for j in map(col, w) if j is not None])
+        indptr.append(len(indices))
+
+    # float64 values, the type sklearn classifiers work with
+    data = np.ones(len(indices), dtype=np.float64)
+    X = scipy.sparse.csr_matrix((data,
+                                 np.frombuffer(indices, dtype=np.int32),
+                                 np.frombuffer(indptr, dtype=np.int32)),
+                                shape=(len(examples),len(fidx)))
+    # repeated features are stored once, as in Dataset.csr_matrix
+    X.sum_duplicates()
+    return X
+
+
 class Dataset :
     # -----  load dataset (already converted to feature vectors),
-    # -----  and create feature index
-    def __init__(self, datafile) :
+    # -----  and create feature index.
+    # -----  Datafile may be a binary feature file (see util/featfile.py),
+    # -----  which is memory-mapped, or an old text one.
+    # -----  If a hasher is given, features are hashed instead of indexed.
+    # -----  If index is False, features are neither indexed nor hashed
+    # -----  (e.g. data to be annotated by an existing model).
+    # -----  Indexed features appearing in less than minfreq examples are
+    # -----  dropped and, if kbest is given, only the kbest features most
+    # -----  related to the labels (chi-squared test) are kept.
+    def __init__(self, datafile, hasher=None, index=True, minfreq=1, kbest=None) :
         self.examples = []
         self.fidx = {}
-        nf = 0
-        with open(datafile) as df :
-            for line in df.readlines() :
-                line = line.strip().split()
-                sid,e1,e2,label = line[0:4]
-                features = line[4:]
-                self.examples.append({"sid":sid, "e1":e1, "e2": e2, "label": label, "features": features})
-                # add features to index
-                for f in features :
-                    if f not in self.fidx :
-                        self.fidx[f] = len(self.fidx)
-
-    ## ------ allow access to feature index
+        self.hasher = hasher
+        index = index and hasher is None
+        self.ff = None
+        self.XY = None
+        # column of each feature occurrence, and where each example starts
+        # (CSR matrix indices and indptr), collected while loading
+        self.indices = array("i")
+        self.indptr = array("i", [0])
+
+        if is_featfile(datafile) :
+            self.ff = FeatFile(datafile)
+            # features are numbered by first appearance, as in the index
+            if index : self.fidx = {f:i for i,f in enumerate(self.ff.features)}
+        else :
+            fidx, indices, indptr = self.fidx, self.indices, self.indptr
+            with open(datafile) as df :
+                for line in df :
+                    line = line.strip().split()
+                    sid,e1,e2,label = line[0:4]
+                    features = line[4:]
+                    self.examples.append({"sid":sid, "e1":e1, "e2": e2, "label": label, "features": features})
+                    # add features to index
+                    if not index : continue
+                    for f in features :
+                        j = fidx.get(f)
+                        if j is None : j = fidx[f] = len(fidx)
+                        indices.append(j)
+                    indptr.append(len(indices))
+
+        # drop infrequent or uninformative features
+        if index and (minfreq > 1 or kbest) : self.__prune(minfreq, kbest)
+
+    ## ------ auxiliary for constructor: remove pruned features from the
+    ## ------ matrix and the index. Remaining ones keep their relative order.
+    def __prune(self, minfreq, kbest) :
+        X,Y = self.csr_matrix()
+        # number of examples where each feature appears
+        keep = np.bincount(X.indices, minlength=X.shape[1]) >= minfreq
+        if kbest and keep.sum() > kbest :
+            from sklearn.feature_selection import chi2
+            cols = np.flatnonzero(keep)
+            scores = np.nan_to_num(chi2(X[:,cols], Y)[0])
+            keep[:] = False
+            keep[cols[np.argsort(-scores, kind="stable")[:kbest]]] = True
+
+        cols = np.flatnonzero(keep)
+        features = list(self.fidx)
+        self.fidx = {features[j]:i for i,j in enumerate(cols.tolist())}
+        self.XY = (X[:,cols], Y)
+
+    ## ------ allow access to feature index (the hasher, if features are hashed)
     def feature_index(self) :
-        return self.fidx 
+        return self.hasher if self.hasher is not None else self.fidx
 
-    ## ------ return dataset as a sparse matrix, plus associated gold labels
+    ## ------ return dataset as a sparse matrix, plus associated gold labels.
+    ## ------ The matrix is built once and kept, later calls return the same one.
     def csr_matrix(self) :
-        rowi = [] # row (example number)
-        colj = [] # column (feature number)
-        data = [] # value (1 or 0 since we use binary features)
-        Y = [] # ground truth
-        nex = 0 # example  counter (each word is one example)
+        if self.XY is None :
+            self.XY = self.__build_matrix()
+        return self.XY
 
-        # for each example
-        for ex in self.examples :
-            Y.append(ex["label"])
-            for f in ex["features"] :
-                data.append(1)
-                rowi.append(nex)
-                colj.append(self.fidx[f]) 
-            # next example
-            nex += 1
-            
-        X = scipy.sparse.csr_matrix((data, (rowi, colj)))  
+    ## ------ auxiliary for csr_matrix
+    def __build_matrix(self) :
+        if self.hasher is not None :
+            Y = [ex["label"] for ex in self.instances()]
+            X = self.hasher.transform(ex["features"] for ex in self.instances())
+            return X,Y
+
+        if self.ff is not None :
+            # feature ids in the file are the matrix columns
+            Y = self.ff.column("label")
+            indices, indptr = self.ff.feat_ids, self.ff.feat_ptr
+            ncols = len(self.ff.features)
+        else :
+            # column numbers collected while loading
+            Y = [ex["label"] for ex in self.examples]
+            indices = np.frombuffer(self.indices, dtype=np.int32)
+            indptr = np.frombuffer(self.indptr, dtype=np.int32)
+            ncols = len(self.fidx)
+
+        # binary features, all stored values are 1. A feature repeated in an
+        # example is stored once, with values added up as when building from
+        # coordinates, so pruning counts each example once. Summing sorts
+        # indices in place, so arrays mapped from a feature file are copied.
+        # Values are float64, so sklearn classifiers use the matrix as it is
+        # instead of converting it to floats in fit (a full copy).
+        data = np.ones(len(indices), dtype=np.float64)
+        X = scipy.sparse.csr_matrix((data, indices, indptr), shape=(len(indptr)-1, ncols),
+                                    copy=self.ff is not None)
+        X.sum_duplicates()
         return X,Y
                 
     ## ------ iterator to access each example in the dataset
     def instances(self) :
+        if self.ff is not None :
+            for r in range(self.ff.n_rows()) :
+                sid,e1,e2,label = self.ff.row_info(r)
+                yield {"sid":sid, "e1":e1, "e2": e2, "label": label,
+                       "features": self.ff.row_features(r)}
+            return
+
         for ex in self.examples :
             yield ex
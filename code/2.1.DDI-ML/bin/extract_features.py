@@ -1,9 +1,12 @@
 #! /usr/bin/python3
 
 import sys, os
-from xml.dom.minidom import parse
 import spacy
 
+import paths
+import corpus
+from analysis_cache import AnalysisCache
+from featfile import FeatWriter, FORMATS
 from patterns import *
 
 ## ------------------- 
@@ -89,62 +92,55 @@ def extract_pair_features(tree, entities, e1, e2) :
 ## -- Extract features for each entity pair in each
 ## -- sentence in given file
 
-def extract_features(datafile, outfile, dump_trees=False) :
+def extract_features(datafile, outfile, dump_trees=False, batch_size=64, n_process=1) :
 
-   # open output file
-   outf = open(outfile, "w")
+   # open output feature file
+   outf = FeatWriter(outfile, FORMATS["DDI"][0])
    if dump_trees:
        treedir = os.path.join(os.path.dirname(outfile), "svg")
        os.makedirs(treedir, exist_ok=True)
     
    # create spacy parser
-   nlp = spacy.load("en_core_web_trf",
-                    enable=["transformer", "tagger","attribute_ruler", "lemmatizer", "ner", "parser"])
+   nlp = AnalysisCache("en_core_web_trf",
+                       enable=["transformer", "tagger","attribute_ruler", "lemmatizer", "ner", "parser"])
 
-   # parse XML file, obtaining a DOM tree
-   tree = parse(datafile)
+   # sentences with entity pairs, with their sentence record as context.
+   # Sentences with less than two entities have no pairs, and are skipped
+   sentences = ((s["text"], s) for s in corpus.sentences(datafile) if len(s["entities"]) > 1)
 
-   # process each sentence in the file
-   sentences = tree.getElementsByTagName("sentence")
-   for s in sentences :
-        sid = s.attributes["id"].value   # get sentence id
-        stext = s.attributes["text"].value   # get sentence text
+   # process each sentence in the file, getting syntactic analyses in batches
+   for analysis, s in nlp.pipe(sentences, batch_size=batch_size, n_process=n_process) :
+        sid = s["id"]   # get sentence id
         print(f"extracting sentence {sid}             \r", end="")
-        # load sentence entities
+        # load sentence entities. Discontinuous entities cover
+        # from the first span start to the last span end
         entities = {}
-        ents = s.getElementsByTagName("entity")
-        for e in ents :
-           id = e.attributes["id"].value
-           offs = e.attributes["charOffset"].value.split("-")           
-           text = e.attributes["text"].value
-           typ = e.attributes["type"].value
-           entities[id] = {'start': int(offs[0]), 'end': int(offs[-1]),
-                           'text': text, 'type' : typ}
-
-        # there are no entity pairs, skip sentence
-        if len(entities) <= 1 : continue
-
-        # get syntactic analysis for the sentence
-        analysis = nlp(stext)
+        for e in s["entities"] :
+           entities[e["id"]] = {'start': e["spans"][0][0], 'end': e["spans"][-1][1],
+                                'text': e["text"], 'type' : e["type"]}
+
         if dump_trees : 
            svg = spacy.displacy.render(analysis,style="dep")    
            with open(os.path.join(treedir,sid+".svg"),"w") as sf :  
               sf.write(svg)       
         
         # for each pair in the sentence, decide whether it is DDI and its type
-        pairs = s.getElementsByTagName("pair")
-        for p in pairs:
+        for p in s["pairs"]:
             # ground truth
-            ddi = p.attributes["ddi"].value
-            if (ddi=="true") : dditype = p.attributes["type"].value
+            if p["ddi"] : dditype = p["type"]
             else : dditype = "null"
             # target entities
-            id_e1 = p.attributes["e1"].value
-            id_e2 = p.attributes["e2"].value
+            id_e1 = p["e1"]
+            id_e2 = p["e2"]
             # feature extraction
             feats = extract_pair_features(analysis,entities,id_e1,id_e2) 
-            # resulting vector
-            print(sid, id_e1, id_e2, dditype, "\t".join(feats), sep="\t", file=outf)
+            # resulting vector. Features are split on any whitespace,
+            # as they were when read back from old text files
+            outf.add([sid, id_e1, id_e2, dditype], " ".join(feats).split())
+
+   outf.close()
+   # store new analyses for later runs
+   nlp.save()
 
 
 ## --------- MAIN PROGRAM ----------- 
@@ -1,13 +1,17 @@
 #!/usr/bin/env python3
 
 import sys
+from itertools import islice
 from dataset import *
 from MEM import *
 from SVM import *
 
+# number of examples classified at once
+BATCH_SIZE = 20000
+
 def predict(datafile, modelfile, outputfile):
     # load data to annotate
-    ds = Dataset(datafile)
+    ds = Dataset(datafile, index=False)
 
     # load trained model to use
     ext = modelfile[-4:]
@@ -18,11 +22,15 @@ def predict(datafile, modelfile, outputfile):
         sys.exit(1)
 
     outf = open(outputfile, "w")
-    # process each example and get predicted label
-    for ex in ds.instances():
-        pred = model.predict(ex["features"])
-        if pred != "null" :
-            print(ex["sid"],ex["e1"],ex["e2"],pred[0], sep="|", file=outf)
+    examples = ds.instances()
+    while True :
+        # process examples in batches, getting all predicted labels at once
+        batch = list(islice(examples, BATCH_SIZE))
+        if not batch : break
+        preds = model.predict_batch([ex["features"] for ex in batch])
+        for ex, pred in zip(batch, preds) :
+            if pred != "null" :
+                print(ex["sid"],ex["e1"],ex["e2"],pred, sep="|", file=outf)
     outf.close()
             
 
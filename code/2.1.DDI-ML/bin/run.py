@@ -24,6 +24,16 @@ from predict import predict
 #    - for SVM: C, kernel, degree, gamma
 #               More details about parameters at: 
 #               https://scikit-learn.org/stable/modules/generated/sklearn.linear_model.LogisticRegression.html
+#    - for SVM and MEM: hash_size
+#               Number of buckets to hash features into (signed hashing trick).
+#               If not given, an index of all features is stored with the model.
+#    - for SVM and MEM: minfreq, kbest
+#               Index only features seen in at least minfreq training examples
+#               and, if kbest is given, only the kbest of them with highest
+#               chi-squared score. Not used with hash_size.
+#    - for feature extraction: nlp_batch_size, nlp_n_process
+#               Number of sentences per spaCy batch, and number of processes
+#               used to analyze them.
 #    Omitted parameters will receive a default value
 #    Parametres may be mixed, each model will select its own.
 #
@@ -60,6 +70,8 @@ for p in sys.argv[1:]:
     if "=" in p:
         par,val = p.split("=")
         params[par] = val
+nlp_batch_size = int(params.get("nlp_batch_size", 64))
+nlp_n_process = int(params.get("nlp_n_process", 1))
 
 # if feature extraction is required, do it
 if "extract" in sys.argv[1:] :
@@ -67,17 +79,20 @@ if "extract" in sys.argv[1:] :
     if "test" in sys.argv[1:] :
         print("Extracting features for test...         ")
         extract_features(os.path.join(paths.DATA,"test.xml"), 
-                         os.path.join(paths.PREPROCESS,"test.feat"))
+                         os.path.join(paths.PREPROCESS,"test.feat"),
+                         batch_size=nlp_batch_size, n_process=nlp_n_process)
 
     else : # otherwise, extract features for train and devel
         os.makedirs(paths.PREPROCESS, exist_ok=True)
         # convert datasets to feature vectors
         print("Extracting features for train...           ")
         extract_features(os.path.join(paths.DATA,"train.xml"),
-                         os.path.join(paths.PREPROCESS,"train.feat"))
+                         os.path.join(paths.PREPROCESS,"train.feat"),
+                         batch_size=nlp_batch_size, n_process=nlp_n_process)
         print("Extracting features for devel...           ")
         extract_features(os.path.join(paths.DATA,"devel.xml"), 
-                         os.path.join(paths.PREPROCESS,"devel.feat"))
+                         os.path.join(paths.PREPROCESS,"devel.feat"),
+                         batch_size=nlp_batch_size, n_process=nlp_n_process)
 
     
 # for each required model, see if training or prediction are required
@@ -1,6 +1,7 @@
 import os
 import string
 import re
+import numpy as np
 import torch
 
 from dataset import *
@@ -26,6 +27,8 @@ class Codemaps :
             print(f'codemaps: Missing max_len and/or suf_len parameters in constructor. params={params}')
             exit()
 
+        self.__create_label_names()
+
             
     # --------- Create indexs from training data
     # Extract all words and labels in given sentences and 
@@ -175,8 +178,13 @@ class Codemaps :
         return self.label_index[l]
     ## -------- get label name for given index --------
     def idx2label(self, i) :
-        for l in self.label_index :
-            if self.label_index[l] == i:
-                return l
-        raise KeyError
+        return self.label_names[int(i)]
+    ## -------- get label names for a tensor of indexes, as nested lists --------
+    def idx2labels(self, idx) :
+        return self.label_names[idx.cpu().numpy()].tolist()
+
+    ## -------- create inverse label index: array with the name of each label code
+    def __create_label_names(self) :
+        self.label_names = np.empty(max(self.label_index.values())+1, dtype=object)
+        for l,i in self.label_index.items() : self.label_names[i] = l
 
@@ -1,13 +1,16 @@
 import os, sys
-from xml.dom.minidom import parse
 import pickle
 import torch
 import spacy
 
+import paths
+import corpus
+from analysis_cache import AnalysisCache
+
 class Dataset:
     ##  Parse all XML files in given dir, and load a list of sentences.
     ##  Each sentence is a list of tuples (word, start, end, tag)
-    def __init__(self, filename) :
+    def __init__(self, filename, batch_size=64, n_process=1) :
         if filename[-4:] == ".pck" :
             # parameter is a pickle file, load it
             with open(filename, "rb") as pf:
@@ -16,41 +19,31 @@ class Dataset:
         else : # parameter should be an XML file, load it
             # create spacy Pos Tagger & lemmatizer
             if torch.cuda.is_available() : spacy.require_gpu()
-            nlp = spacy.load("en_core_web_trf")
+            nlp = AnalysisCache("en_core_web_trf")
             self.data = []
-            # parse XML file, obtaining a DOM tree
-            tree = parse(filename)
-            # process each sentence in the file
-            sentences = tree.getElementsByTagName("sentence")
-            for s in sentences :
-                sid = s.attributes["id"].value   # get sentence id
-                stext = s.attributes["text"].value   # get sentence text
+            # sentences with entity pairs, with their sentence record as context.
+            sentences = ((s["text"], s) for s in corpus.sentences(filename) if len(s["entities"]) > 1)
+            # process each sentence in the file, converting texts to
+            # lists of tokens in batches
+            for tokens, s in nlp.pipe(sentences, batch_size=batch_size, n_process=n_process) :
+                sid = s["id"]   # get sentence id
                 print(f"parsing sentence {sid}        \r", end="")
                 
-                ents = s.getElementsByTagName("entity")
-                if len(ents) <= 1 : continue
-                
                 entities = {}
-                for e in ents :
+                for e in s["entities"] :
                     # for discontinuous entities, we only get the first span
                     # (will not work, but there are few of them)
-                    eid =  e.attributes["id"].value
-                    typ =  e.attributes["type"].value
-                    (start,end) = e.attributes["charOffset"].value.split(";")[0].split("-")
-                    entities[eid] = {"start":int(start), "end":int(end), "type": typ}
+                    (start,end) = e["spans"][0]
+                    entities[e["id"]] = {"start":start, "end":end, "type": e["type"]}
 
-                # convert the sentence to a list of tokens
-                tokens = nlp(stext)                
                 # for each pair in the sentence, get whether it is DDI and its type
-                pairs = s.getElementsByTagName("pair")
-                for p in pairs:
+                for p in s["pairs"]:
                     # ground truth
-                    ddi = p.attributes["ddi"].value
-                    if (ddi=="true") : dditype = p.attributes["type"].value
+                    if p["ddi"] : dditype = p["type"]
                     else : dditype = "null"
                     # target entities
-                    e1 = p.attributes["e1"].value
-                    e2 = p.attributes["e2"].value
+                    e1 = p["e1"]
+                    e2 = p["e2"]
                 
                     sent = []
                     seen = set([])
@@ -88,6 +81,9 @@ class Dataset:
                     # resulting vector
                     self.data.append({'sid': sid, 'e1':e1, 'e2':e2, 'type':dditype, 'sent':sent})
 
+            # store new analyses for later runs
+            nlp.save()
+
  
     ## --------------------------------------------------------------
     ## check whether a token belongs to one of given entities
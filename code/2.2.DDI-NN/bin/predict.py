@@ -44,11 +44,12 @@ def predict(modelname, datafile, params, outfile) :
 
     Y = []
     # run each validation example and report validation loss
-    for X in test_loader:
-       # X is a list of input tensors (no labels were loaded in the dataloader)
-       y = model.forward(*X) # run example through the network
-       # add results to result list
-       Y.extend([codes.idx2label(torch.argmax(s)) for s in y])
+    with torch.no_grad() :
+       for X in test_loader:
+          # X is a list of input tensors (no labels were loaded in the dataloader)
+          y = model.forward(*X) # run example through the network
+          # add results to result list: best label of each example in the batch
+          Y.extend(codes.idx2labels(y.argmax(dim=-1)))
 
     # extract relations from result list
     output_interactions(testdata, Y, outfile)
@@ -14,10 +14,14 @@ from predict import predict
 #  You can select wich steps of the experiment execcute:
 #    - parse: Use spaccy to parse the documents and store results in pickle files
 #    - train: Train a NN model
+#      Encoded datasets are cached (project "cache" folder), so further
+#      trainings on the same data and max_len/suf_len start right away.
 #    - predict: Apply the model to development data set and evaluate performance
 #
 #  You can add hyperparameters for training
 #    - batch_size, max_len, suf_len
+#  and parameters for spaCy parsing
+#    - nlp_batch_size, nlp_n_process
 #    Omitted parameters will receive a default value
 #    Parametres may be mixed, each model will select its own.
 #
@@ -43,6 +47,8 @@ for p in sys.argv[1:]:
     if "=" in p:
         par,val = p.split("=")
         params[par] = val
+nlp_batch_size = int(params.get("nlp_batch_size", 64))
+nlp_n_process = int(params.get("nlp_n_process", 1))
         
 if "name" not in params: params["name"]="mymodel_000"
 
@@ -52,17 +58,20 @@ if "parse" in sys.argv[1:] :
     if "test" in sys.argv[1:] : 
         os.makedirs(paths.PREPROCESS, exist_ok=True)
         print("Creating parsed test pickle file...         ")
-        ds = Dataset(os.path.join(paths.DATA,"test.xml"))
+        ds = Dataset(os.path.join(paths.DATA,"test.xml"),
+                     batch_size=nlp_batch_size, n_process=nlp_n_process)
         ds.save(os.path.join(paths.PREPROCESS,"test.pck"))
 
     else : # otherwise, extract features for train and devel
         os.makedirs(paths.PREPROCESS, exist_ok=True)
         # convert datasets to feature vectors
         print("Creating parsed train pickle file...         ")
-        ds = Dataset(os.path.join(paths.DATA,"train.xml"))
+        ds = Dataset(os.path.join(paths.DATA,"train.xml"),
+                     batch_size=nlp_batch_size, n_process=nlp_n_process)
         ds.save(os.path.join(paths.PREPROCESS,"train.pck"))
         print("Creating parsed devel pickle file...         ")
-        ds = Dataset(os.path.join(paths.DATA,"devel.xml"))
+        ds = Dataset(os.path.join(paths.DATA,"devel.xml"),
+                     batch_size=nlp_batch_size, n_process=nlp_n_process)
         ds.save(os.path.join(paths.PREPROCESS,"devel.pck"))
 
     
@@ -9,8 +9,10 @@ from torch.utils.data import TensorDataset, DataLoader
 import torch.optim as optim
 from torchinfo import summary
 
+import paths
 from dataset import *
 from codemaps import *
+from encoding_cache import EncodingCache
 
 from network import ddiCNN, criterion
 
@@ -75,9 +77,21 @@ def validation(network, val_loader):
     return acc
 
 #----------------------------------------------
-def encode_dataset(ds, codes, params) :
+# Encode given dataset and store it in given cache entry under given
+# name: X0, X1... for each input given by Codemaps.encode_words, and
+# y for the labels.
+def encode_dataset(ds, codes, entry, name) :
    X = codes.encode_words(ds)
    y = codes.encode_labels(ds)
+   arrays = {f"X{i}" : x.numpy() for i,x in enumerate(X)}
+   arrays["y"] = y.numpy()
+   entry.save(name, arrays, {"n_inputs" : len(X)})
+
+#----------------------------------------------
+def data_loader(encoded, params) :
+   arrays, meta = encoded
+   X = [torch.from_numpy(arrays[f"X{i}"]) for i in range(meta["n_inputs"])]
+   y = torch.from_numpy(arrays["y"])
    if used_device == "cuda:0" :
       X = [x.to(torch.device(used_device)) for x in X]
       y = y.to(torch.device(used_device))
@@ -94,15 +108,32 @@ def do_train(trainfile, valfile, params, modelname) :
     if 'batch_size' not in params : params['batch_size'] = 16
     if 'epochs' not in params : params['epochs'] = 10
 
-    # load pickle datasets (or parse if needed)
-    traindata = Dataset(trainfile)
-    valdata = Dataset(valfile)
-
-    # create indexes from training data
-    codes  = Codemaps(traindata, params)
-    # encode datasets
-    train_loader = encode_dataset(traindata, codes, params)
-    val_loader = encode_dataset(valdata, codes, params)
+    # encoded datasets and codemaps are cached, runs with the same data,
+    # encoding code, and encoding parameters skip loading and encoding
+    cache = EncodingCache(os.path.basename(paths.CLASSIFIER),
+                          [trainfile, valfile, sys.modules[Codemaps.__module__].__file__],
+                          {'max_len' : params['max_len']})
+    if not cache.exists() :
+       with cache.build() as entry :
+          # load pickle datasets (or parse if needed)
+          traindata = Dataset(trainfile)
+          valdata = Dataset(valfile)
+
+          # create indexes from training data
+          codes  = Codemaps(traindata, params)
+          codes.save(entry.path("codemaps"))
+          # encode datasets
+          encode_dataset(traindata, codes, entry, "train")
+          encode_dataset(valdata, codes, entry, "devel")
+
+    # load codemaps and datasets from the complete cache entry, so they
+    # match even if another run created it at the same time
+    print(f"Using encoded datasets cached in {cache.cachedir}")
+    codes = Codemaps(cache.path("codemaps"), {})
+    train_enc, val_enc = cache.load("train"), cache.load("devel")
+
+    train_loader = data_loader(train_enc, params)
+    val_loader = data_loader(val_enc, params)
 
     # build network
     network = ddiCNN(codes)
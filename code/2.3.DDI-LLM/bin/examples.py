@@ -1,6 +1,8 @@
 import sys, random, re
 from collections import Counter
-from xml.dom.minidom import parse
+
+import paths
+import corpus
 
 
 class Examples() :
@@ -9,33 +11,26 @@ class Examples() :
     def __init__(self, xmlfile, task) :
        self.task = task
        self.data = []
-       tree = parse(xmlfile)   
        # process each sentence in the file
-       sentences = tree.getElementsByTagName("sentence")
-       for s in sentences :
-          sid = s.attributes["id"].value   # get sentence id
-          stext = s.attributes["text"].value.strip()   # get sentence text
-          entities = s.getElementsByTagName("entity") # get gold standard entities
+       for s in corpus.sentences(xmlfile) :
+          sid = s["id"]   # get sentence id
+          stext = s["text"].strip()   # get sentence text
           spans = []
-          for e in entities :
+          for e in s["entities"] : # get gold standard entities
              # for discontinuous entities, we only get the first span
              # (will not work, but there are few of them)
-             eid = e.attributes["id"].value
-             (start,end) = e.attributes["charOffset"].value.split(";")[0].split("-")
-             typ =  e.attributes["type"].value
-             spans.append((int(start),int(end),typ,eid)) 
+             (start,end) = e["spans"][0]
+             spans.append((start,end,e["type"],e["id"])) 
 
-          pairs = s.getElementsByTagName("pair") # get gold standard pairs
           interactions = []
-          for p in pairs :          
-             pid = s.attributes["id"].value   # get pair id
+          for p in s["pairs"] : # get gold standard pairs
+             pid = p["id"]   # get pair id
              # ground truth
-             ddi = p.attributes["ddi"].value
-             if (ddi=="true") : dditype = p.attributes["type"].value
+             if p["ddi"] : dditype = p["type"]
              else : dditype = "null"
              # target entities
-             e1 = p.attributes["e1"].value
-             e2 = p.attributes["e2"].value
+             e1 = p["e1"]
+             e2 = p["e2"]
              interactions.append((e1,e2,dditype,pid))
 
           # start with the last span to simplfy offset computation
@@ -0,0 +1,69 @@
+
+# Affix lists used as hints of chemical/drug names, and a compiled matcher
+# to find which affix classes a word has.
+#
+# The matcher stores all affixes of all classes in a single trie (built on
+# reversed strings for suffixes), so all classes matching a word are found
+# walking it once, instead of testing each affix in each class.
+#
+# Usage:
+#    SUFFIXES.match("ciprofloxacin")   # {"chemSuffix"}
+#    m = AffixMatcher({"x":["ab","b"], "y":["cb"]})
+#    m.match("acb")                    # {"x","y"}
+
+CHEM_PREFIXES = {'nor','des','dex','iso','neo','oxo','oxy',
+                 'pro','sul','tri','ben','eth','meth','prop',
+                 'cef','cep','flu','ami','car','clo',
+                 'phe','rif','ver','hal'}
+
+CHEM_SUFFIXES = {'ine','ide','ate','ase','ium','one','ene',
+                 'ole','ane','cin','zol','pam','lol','pril',
+                 'mab','tin','vir','xan','fen','zan',
+                 'oxin','pine','line','mine','azine','idine',
+                 'oxine','tocin','barbital','floxacin','lukast','dipine'}
+
+DRUGN_SUFFIXES = {'atin', 'idin', 'osin', 'asin', 'itol',
+                  'esin', 'thane', 'statin', 'tropin',
+                  'toxin', 'amine', 'idine'}
+
+GROUP_SUFFIXES = {'ones', 'oids', 'ines', 'ants', 'tics', 'ives',
+                  'ents', 'ases', 'oles', 'anes', 'kers',
+                  'sants', 'nics', 'zines', 'nols', 'xants'}
+
+
+class AffixMatcher :
+
+    ## --------------------------------------------------
+    ## Constructor. 'classes' is a dictionary class name -> list of
+    ## affixes. If 'suffix' is False, affixes are prefixes.
+    ## --------------------------------------------------
+    def __init__(self, classes, suffix=True) :
+        self.suffix = suffix
+        # trie nodes are dictionaries char -> child node. Key None holds
+        # the classes of the affix ending at that node, if any.
+        self.trie = {}
+        for cls, affixes in classes.items() :
+            for a in affixes :
+                node = self.trie
+                for c in (reversed(a) if suffix else a) :
+                    node = node.setdefault(c, {})
+                node[None] = node.get(None, frozenset()) | {cls}
+
+    ## --------------------------------------------------
+    ## return the set of classes with some affix matching given word.
+    ## Matching is case sensitive, so word should be lowercased
+    ## --------------------------------------------------
+    def match(self, word) :
+        found = frozenset()
+        node = self.trie
+        for c in (reversed(word) if self.suffix else word) :
+            node = node.get(c)
+            if node is None : break
+            if None in node : found = found | node[None]
+        return found
+
+
+## suffix classes used as token features
+SUFFIXES = AffixMatcher({"chemSuffix" : CHEM_SUFFIXES,
+                         "drugNSuffix" : DRUGN_SUFFIXES,
+                         "groupSuffix" : GROUP_SUFFIXES})
@@ -0,0 +1,223 @@
+
+# Persistent cache of spaCy analyses, shared by all stages.
+#
+# Analyzed sentences are stored as spaCy Docs in DocBin shards under
+# the project "cache" directory. Each Doc is addressed by the hash of its
+# text, and the cache is kept separately for each spaCy model, version, and
+# set of enabled pipeline components, so different analyzers never mix.
+#
+# The spaCy pipeline is only loaded when a sentence is not found in the
+# cache, so a re-run over already analyzed data does not need to load nor
+# run the transformer at all.
+#
+# Usage:
+#    nlp = AnalysisCache("en_core_web_trf", disable=["lemmatizer"])
+#    doc = nlp(text)    # same as spacy.load(...)(text), but cached
+#    for doc, context in nlp.pipe(pairs, batch_size=64, n_process=2) :
+#       ...             # same as nlp.pipe(pairs, as_tuples=True), but cached
+#    ...
+#    nlp.save()         # store new analyses to disk
+
+import os, sys
+import time
+import hashlib
+from collections import deque
+import spacy
+from spacy.tokens import DocBin
+
+# folder where this file is located, and main project folder one level up
+UTILDIR = os.path.abspath(os.path.dirname(__file__))
+MAINDIR = os.path.dirname(UTILDIR)
+# default location for cached analyses
+CACHEDIR = os.path.join(MAINDIR, "cache", "spacy")
+
+
+class AnalysisCache :
+
+    ## --------------------------------------------------
+    ## Constructor. 'model' and 'load_args' are the same
+    ## arguments that would be given to spacy.load
+    ## --------------------------------------------------
+    def __init__(self, model, cachedir=CACHEDIR, **load_args) :
+        self.model = model
+        self.load_args = load_args
+        self.nlp = None  # loaded only if needed
+
+        # model metadata, used to identify the analyzer
+        meta = self.__model_meta(model)
+        self.lang = meta.get("lang", "en")
+        components = self.__enabled_components(meta.get("pipeline", []), load_args)
+        if "lang" in meta : name = meta["lang"] + "_" + meta["name"]
+        else : name = os.path.basename(model)
+        self.cachedir = os.path.join(cachedir,
+                                     name + "-" + meta.get("version", "unknown"),
+                                     "+".join(components) if components else "tokenizer")
+
+        self.vocab = None
+        self.shards = {}   # shard name -> {text hash -> Doc}
+        self.modified = set()  # shards with new analyses, not saved yet
+        self.hits = 0
+        self.misses = 0
+
+    ## --------------------------------------------------
+    ## get model metadata, without loading the model
+    ## --------------------------------------------------
+    def __model_meta(self, model) :
+        try :
+            if spacy.util.is_package(model) :
+                path = spacy.util.get_package_path(model)
+            else :
+                path = model
+            return spacy.util.load_meta(os.path.join(path, "meta.json"))
+        except (OSError, ValueError) :
+            # unknown location, use whatever spacy.load would find
+            return {}
+
+    ## --------------------------------------------------
+    ## get list of components that spacy.load will enable with given args
+    ## --------------------------------------------------
+    def __enabled_components(self, pipeline, load_args) :
+        enable = load_args.get("enable", None)
+        if type(enable) == str : enable = [enable]
+        disable = []
+        for k in ["disable", "exclude"] :
+            d = load_args.get(k, [])
+            disable.extend([d] if type(d) == str else d)
+        return [c for c in pipeline
+                if (enable is None or c in enable) and c not in disable]
+
+    ## --------------------------------------------------
+    ## load spaCy pipeline, if not loaded yet
+    ## --------------------------------------------------
+    def __load_nlp(self) :
+        if self.nlp is None :
+            self.nlp = spacy.load(self.model, **self.load_args)
+        return self.nlp
+
+    ## --------------------------------------------------
+    ## vocabulary used to restore cached Docs
+    ## --------------------------------------------------
+    def __get_vocab(self) :
+        if self.nlp is not None : return self.nlp.vocab
+        if self.vocab is None : self.vocab = spacy.blank(self.lang).vocab
+        return self.vocab
+
+    ## --------------------------------------------------
+    ## compute cache key for given text
+    ## --------------------------------------------------
+    def key(self, text) :
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    ## --------------------------------------------------
+    ## get shard for given key, loading it from disk if needed
+    ## --------------------------------------------------
+    def __shard(self, key) :
+        name = key[:2]
+        if name not in self.shards :
+            self.shards[name] = {}
+            fname = os.path.join(self.cachedir, name+".spacy")
+            if os.path.exists(fname) :
+                docbin = DocBin().from_disk(fname)
+                for doc in docbin.get_docs(self.__get_vocab()) :
+                    self.shards[name][self.key(doc.text)] = doc
+        return self.shards[name]
+
+    ## --------------------------------------------------
+    ## get cached analysis for given text, or None if not found
+    ## --------------------------------------------------
+    def get(self, text) :
+        key = self.key(text)
+        return self.__shard(key).get(key)
+
+    ## --------------------------------------------------
+    ## store analysis for given text
+    ## --------------------------------------------------
+    def put(self, text, doc) :
+        key = self.key(text)
+        self.__shard(key)[key] = doc
+        self.modified.add(key[:2])
+
+    ## --------------------------------------------------
+    ## analyze given text, using cached result if available
+    ## --------------------------------------------------
+    def __call__(self, text) :
+        doc = self.get(text)
+        if doc is None :
+            self.misses += 1
+            doc = self.__load_nlp()(text)
+            self.put(text, doc)
+        else :
+            self.hits += 1
+        return doc
+
+    ## --------------------------------------------------
+    ## analyze a stream of (text, context) pairs, yielding (Doc, context)
+    ## pairs in the same order. Texts not in the cache are analyzed in
+    ## batches of 'batch_size' by 'n_process' processes using nlp.pipe
+    ## --------------------------------------------------
+    def pipe(self, items, batch_size=64, n_process=1) :
+        t0 = time.time()
+        nsent = 0
+        items = iter(items)
+        # items read so far and not yielded yet: (text, context, cached Doc or None)
+        pending = deque()
+
+        # serve cached analyses until the first text that needs analysis,
+        # so the pipeline is not loaded if everything is in the cache
+        for text, context in items :
+            doc = self.get(text)
+            if doc is None :
+                pending.append((text, context, None))
+                break
+            self.hits += 1
+            nsent += 1
+            yield doc, context
+
+        # texts to analyze, queueing everything read from items
+        def misses() :
+            yield pending[0][0]
+            for text, context in items :
+                doc = self.get(text)
+                pending.append((text, context, doc))
+                if doc is None : yield text
+
+        if pending :
+            nlp = self.__load_nlp()
+            for doc in nlp.pipe(misses(), batch_size=batch_size, n_process=n_process) :
+                # yield cached analyses preceding the analyzed text, then the text
+                text, context, cached = pending.popleft()
+                while cached is not None :
+                    self.hits += 1
+                    nsent += 1
+                    yield cached, context
+                    text, context, cached = pending.popleft()
+                self.misses += 1
+                nsent += 1
+                self.put(text, doc)
+                yield doc, context
+
+            # cached analyses after the last analyzed text
+            while pending :
+                text, context, cached = pending.popleft()
+                self.hits += 1
+                nsent += 1
+                yield cached, context
+
+        elapsed = time.time() - t0
+        print(f"Analyzed {nsent} sentences in {elapsed:.1f} seconds ({nsent/max(elapsed,1e-6):.1f} sentences/sec)")
+
+    ## --------------------------------------------------
+    ## write to disk shards containing new analyses
+    ## --------------------------------------------------
+    def save(self) :
+        print(f"Analysis cache: {self.hits} sentences found, {self.misses} analyzed")
+        if not self.modified : return
+        os.makedirs(self.cachedir, exist_ok=True)
+        for name in self.modified :
+            docbin = DocBin(docs=self.shards[name].values())
+            fname = os.path.join(self.cachedir, name+".spacy")
+            # write to temporary file first, so an interrupted run
+            # never leaves a broken shard behind
+            docbin.to_disk(fname+".tmp")
+            os.replace(fname+".tmp", fname)
+        self.modified = set()
@@ -0,0 +1,116 @@
+
+# Binary container for named NumPy arrays, loaded via memory mapping.
+#
+# File layout:
+#
+#   8 bytes    magic string "AHLTARR1"
+#   8 bytes    header length, little-endian unsigned integer
+#   header     UTF-8 JSON: { "meta" : {...},
+#                            "arrays" : { name : {"dtype", "shape", "offset"} } }
+#   data       raw array contents, each one starting at an offset
+#              multiple of ALIGN bytes from the beginning of the file
+#
+# "meta" holds any small JSON-serializable data the caller wants to keep
+# along with the arrays. Loading maps the whole file once and returns
+# read-only array views on it, so nothing is actually read from disk
+# until it is used, and all processes loading the same file share the
+# memory pages.
+#
+# Usage:
+#    arrayfile.save(fname, {"a" : np.arange(10)}, meta={"version" : 1})
+#    arrays, meta = arrayfile.load(fname)
+
+import json
+import struct
+import numpy as np
+
+MAGIC = b"AHLTARR1"
+ALIGN = 64
+
+
+## --
+## -- round up n to a multiple of ALIGN
+## --
+
+def _aligned(n) :
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+## --
+## -- save given dictionary of arrays, plus optional metadata, to filename
+## --
+
+def save(filename, arrays, meta=None) :
+    arrays = {name : np.ascontiguousarray(a) for name,a in arrays.items()}
+
+    # compute data offsets relative to data start
+    layout = {}
+    offset = 0
+    for name,a in arrays.items() :
+        layout[name] = {"dtype" : a.dtype.str, "shape" : list(a.shape), "offset" : offset}
+        offset = _aligned(offset + a.nbytes)
+
+    header = json.dumps({"meta" : meta or {}, "arrays" : layout},
+                        ensure_ascii=False).encode("utf-8")
+    start = _aligned(len(MAGIC) + 8 + len(header))
+
+    with open(filename, "wb") as f :
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for name,a in arrays.items() :
+            f.seek(start + layout[name]["offset"])
+            f.write(a.tobytes())
+        # make sure file covers padding of last array
+        f.truncate(start + offset)
+
+
+## --
+## -- load arrays and metadata from filename. Returns (arrays, meta).
+## -- If mmap is False, arrays are read in memory instead of mapped.
+## -- If copy_on_write is True, mapped arrays are writable, but changes
+## -- stay in memory and are never written back to the file.
+## --
+
+def load(filename, mmap=True, copy_on_write=False) :
+    with open(filename, "rb") as f :
+        if f.read(len(MAGIC)) != MAGIC :
+            raise ValueError(f"{filename} is not an array file")
+        (hlen,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(hlen).decode("utf-8"))
+    start = _aligned(len(MAGIC) + 8 + hlen)
+
+    if mmap : buf = np.memmap(filename, dtype=np.uint8, mode="c" if copy_on_write else "r")
+    else : buf = np.fromfile(filename, dtype=np.uint8)
+
+    arrays = {}
+    for name,info in header["arrays"].items() :
+        dtype = np.dtype(info["dtype"])
+        shape = tuple(info["shape"])
+        nbytes = dtype.itemsize * int(np.prod(shape))
+        off = start + info["offset"]
+        arrays[name] = buf[off:off+nbytes].view(dtype).reshape(shape)
+
+    return arrays, header["meta"]
+
+
+## --
+## -- encode a list of strings as two arrays: UTF-8 bytes and offsets,
+## -- string i being bytes[offsets[i]:offsets[i+1]]
+## --
+
+def pack_strings(strings) :
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded)+1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+## --
+## -- decode list of strings encoded with pack_strings
+## --
+
+def unpack_strings(data, offsets) :
+    data = data.tobytes()
+    offsets = offsets.tolist()
+    return [data[offsets[i]:offsets[i+1]].decode("utf-8") for i in range(len(offsets)-1)]
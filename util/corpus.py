@@ -0,0 +1,96 @@
+
+# Streaming reader for the DDI corpus XML files.
+#
+# Sentences are read one at a time with xml.etree.ElementTree.iterparse, and
+# each element is discarded as soon as it has been yielded, so memory usage
+# does not depend on the size of the corpus file.
+#
+# Each sentence is returned as a dictionary:
+#
+#   { "id" : sentence id,
+#     "text" : sentence text,
+#     "entities" : [ { "id", "type", "text", "offset", "spans" }, ... ],
+#     "pairs" : [ { "id", "e1", "e2", "ddi", "type" }, ... ]
+#   }
+#
+# where "offset" is the charOffset attribute as found in the XML, and
+# "spans" is the list of (start,end) integer pairs it contains (more than
+# one for discontinuous entities). "ddi" is a boolean, and "type" is the
+# interaction type, or None if there is no interaction.
+
+import sys
+from xml.etree.ElementTree import iterparse
+
+
+## --
+## -- convert a charOffset value (e.g. "12-20" or "12-20;31-35") in a list of (start,end) spans
+## --
+
+def offset_spans(offset) :
+    spans = []
+    for sp in offset.split(";") :
+        (start,end) = sp.split("-")
+        spans.append((int(start),int(end)))
+    return spans
+
+
+## --
+## -- build sentence record from a <sentence> element
+## --
+
+def sentence_record(s) :
+    entities = []
+    for e in s.iter("entity") :
+        entities.append({"id" : e.get("id"),
+                         "type" : e.get("type"),
+                         "text" : e.get("text"),
+                         "offset" : e.get("charOffset"),
+                         "spans" : offset_spans(e.get("charOffset"))
+                         })
+    pairs = []
+    for p in s.iter("pair") :
+        ddi = p.get("ddi") == "true"
+        pairs.append({"id" : p.get("id"),
+                      "e1" : p.get("e1"),
+                      "e2" : p.get("e2"),
+                      "ddi" : ddi,
+                      "type" : p.get("type") if ddi else None
+                      })
+
+    return {"id" : s.get("id"),
+            "text" : s.get("text"),
+            "entities" : entities,
+            "pairs" : pairs
+            }
+
+
+## --
+## -- iterator over all sentences in given XML file (or open file object)
+## --
+
+def sentences(datafile) :
+    context = iterparse(datafile, events=("start","end"))
+    # get root element, to be able to drop processed documents
+    _, root = next(context)
+    for event, elem in context :
+        if event != "end" : continue
+
+        if elem.tag == "sentence" :
+            yield sentence_record(elem)
+            # sentence already processed, free its memory
+            elem.clear()
+        elif elem.tag == "document" :
+            # all sentences in the document are processed, drop it
+            root.clear()
+
+
+## --
+## -- Usage as standalone program:  corpus.py datafile
+## --
+## -- Prints id and text of each sentence in datafile, (useful for
+## -- data exploration)
+## --
+
+if __name__ == "__main__" :
+    for s in sentences(sys.argv[1]) :
+        print(s["id"], s["text"], sep="|")
@@ -0,0 +1,137 @@
+# Persistent cache of encoded datasets, for the NN stages.
+#
+# Before training, a network needs its datasets loaded (pickled spaCy
+# analyses), the codemaps created from training data, and every token
+# converted to codes. This only depends on the preprocessed files and a
+# few encoding parameters (max_len, suf_len...), so the result is stored
+# under the project "cache" directory, in a folder (an "entry") named after
+# a hash of the files contents and the parameters. Training runs that
+# differ only in other hyperparameters reuse it.
+#
+# Encoded arrays are kept in array files (see arrayfile.py), memory-mapped
+# when loaded. The codemaps are saved in the entry too, with Codemaps.save.
+#
+# Codes depend on the order in which the codemaps were created, so the
+# codemaps and all arrays of an entry must come from the same run. An entry
+# is built in a private temporary folder, and moved in place as a whole
+# once complete. If several runs build the same entry at once, the first
+# one to finish wins, and the others discard theirs. Entries are thus only
+# read when complete, and always consistent.
+#
+# Usage:
+#    cache = EncodingCache("1.2.NERC-NN", [trainfile, valfile], {"max_len":150})
+#    if not cache.exists() :
+#       with cache.build() as entry :
+#          ...
+#          codes.save(entry.path("codemaps"))
+#          entry.save("train", {"lens" : lens, ...}, meta={...})
+#    codes = Codemaps(cache.path("codemaps"), {})
+#    arrays, meta = cache.load("train")
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+from contextlib import contextmanager
+
+import arrayfile
+
+# folder where this file is located, and main project folder one level up
+UTILDIR = os.path.abspath(os.path.dirname(__file__))
+MAINDIR = os.path.dirname(UTILDIR)
+# default location for cached encodings
+CACHEDIR = os.path.join(MAINDIR, "cache", "encoded")
+
+# format version of cache entries, part of their key. Increase when it changes.
+VERSION = 2
+
+
+#-------------------------------------------
+# Folder where the contents of a cache entry are written
+#-------------------------------------------
+class CacheEntry :
+
+    def __init__(self, dirname) :
+        self.dirname = dirname
+
+    ## --------------------------------------------------
+    ## path for given item in the entry (e.g. the codemaps)
+    ## --------------------------------------------------
+    def path(self, name) :
+        return os.path.join(self.dirname, name)
+
+    ## --------------------------------------------------
+    ## store given dictionary of arrays, plus optional metadata,
+    ## under given name
+    ## --------------------------------------------------
+    def save(self, name, arrays, meta=None) :
+        arrayfile.save(self.path(name + ".arr"), arrays, meta)
+
+
+class EncodingCache :
+
+    ## --------------------------------------------------
+    ## Constructor. 'name' identifies the task (e.g. "1.2.NERC-NN"),
+    ## 'datafiles' are the preprocessed files the encoding comes from,
+    ## and 'params' the parameters that change the encoding.
+    ## --------------------------------------------------
+    def __init__(self, name, datafiles, params, cachedir=CACHEDIR) :
+        key = hashlib.sha1(f"{VERSION}|".encode("ascii"))
+        for fname in datafiles :
+            key.update(self.__file_hash(fname).encode("ascii"))
+        key.update(json.dumps({k:str(v) for k,v in params.items()}, sort_keys=True).encode("utf-8"))
+        self.name = name + "-" + key.hexdigest()[:16]
+        self.basedir = cachedir
+        self.cachedir = os.path.join(cachedir, self.name)
+
+    ## --------------------------------------------------
+    ## hash of given file contents
+    ## --------------------------------------------------
+    def __file_hash(self, fname) :
+        h = hashlib.sha1()
+        with open(fname, "rb") as f :
+            for block in iter(lambda: f.read(1<<20), b"") :
+                h.update(block)
+        return h.hexdigest()
+
+    ## --------------------------------------------------
+    ## check whether the (complete) entry is in the cache
+    ## --------------------------------------------------
+    def exists(self) :
+        return os.path.isdir(self.cachedir)
+
+    ## --------------------------------------------------
+    ## path for given item in the cache entry (e.g. the codemaps)
+    ## --------------------------------------------------
+    def path(self, name) :
+        return os.path.join(self.cachedir, name)
+
+    ## --------------------------------------------------
+    ## load arrays and metadata stored under given name.
+    ## Returns (arrays, meta), or None if they are not in the cache.
+    ## --------------------------------------------------
+    def load(self, name) :
+        fname = self.path(name + ".arr")
+        if not os.path.exists(fname) : return None
+        return arrayfile.load(fname, copy_on_write=True)
+
+    ## --------------------------------------------------
+    ## context to build the entry: gives a CacheEntry on a temporary
+    ## folder, which is moved in place when the context ends without
+    ## errors (or discarded, if the entry was completed by another run
+    ## in the meantime, or on errors).
+    ## --------------------------------------------------
+    @contextmanager
+    def build(self) :
+        os.makedirs(self.basedir, exist_ok=True)
+        tmpdir = tempfile.mkdtemp(prefix=self.name + ".", suffix=".tmp", dir=self.basedir)
+        try :
+            yield CacheEntry(tmpdir)
+            try :
+                os.rename(tmpdir, self.cachedir)
+            except OSError :
+                # another run finished the same entry first, keep that one
+                if not self.exists() : raise
+        finally :
+            if os.path.isdir(tmpdir) : shutil.rmtree(tmpdir)
@@ -3,7 +3,7 @@
 import sys
 from os import listdir
 
-from xml.dom.minidom import parse
+import corpus
 
 ## --
 ## -- auxliary to insert an instance in given instance_set
@@ -23,19 +23,14 @@ def add_instance(instance_set, einfo, etype) :
 def load_gold_NER(goldfile) :
     entities = { "CLASS" : set([]), "NOCLASS" : set([]) }
 
-    # parse XML file, obtaining a DOM tree
-    tree = parse(goldfile)
-
     # process each sentence in the file
-    sentences = tree.getElementsByTagName("sentence")
-    for s in sentences :
-        sid = s.attributes["id"].value   # get sentence id
+    for s in corpus.sentences(goldfile) :
+        sid = s["id"]   # get sentence id
 
         # load sentence entities
-        ents = s.getElementsByTagName("entity")
-        for e in ents :
-            einfo = sid + "|" + e.attributes["charOffset"].value  + "|" + e.attributes["text"].value
-            etype = e.attributes["type"].value
+        for e in s["entities"] :
+            einfo = sid + "|" + e["offset"]  + "|" + e["text"]
+            etype = e["type"]
             add_instance(entities, einfo, etype)
             
     return entities
@@ -47,24 +42,15 @@ def load_gold_NER(goldfile) :
 def load_gold_DDI(goldfile) :
     relations = { "CLASS" : set([]), "NOCLASS" : set([]) }
 
-    # parse XML file, obtaining a DOM tree
-    tree = parse(goldfile)
-
     # process each sentence in the file
-    sentences = tree.getElementsByTagName("sentence")
-    for s in sentences :
-        sid = s.attributes["id"].value   # get sentence id
+    for s in corpus.sentences(goldfile) :
+        sid = s["id"]   # get sentence id
 
         # load "pairs"  in the sentence, keep those with ddi=true
-        pairs = s.getElementsByTagName("pair")
-        for p in pairs:
-            id_e1 = p.attributes["e1"].value
-            id_e2 = p.attributes["e2"].value
-            ddi = p.attributes["ddi"].value
-
-            if (ddi == "true") :
-                rtype = p.attributes["type"].value
-                rinfo = sid + "|" + id_e1 + "|" +  id_e2
+        for p in s["pairs"] :
+            if p["ddi"] :
+                rtype = p["type"]
+                rinfo = sid + "|" + p["e1"] + "|" +  p["e2"]
                 add_instance(relations, rinfo, rtype)
 
     return relations
@@ -92,6 +78,19 @@ def load_predicted(task, outfile) :
     
 
 
+## --
+## -- Build set of predicted entities/relations from given tuples, with the
+## -- fields of a system output line: (sid, offset, text, type) for
+## -- entities, (sid, e1, e2, type) for relations
+## --
+
+def predicted_set(predictions) :
+    predicted = { "CLASS" : set([]), "NOCLASS" : set([]) }
+    for p in predictions :
+        add_instance(predicted, "|".join(p[:-1]), p[-1])
+    return predicted
+
+
 ## --
 ## -- Compare given sets and compute tp,fp,fn,P,R,F1
 ## --
@@ -132,14 +131,12 @@ def print_statistics(gold, predicted, statsfile) :
     with open(statsfile,"w") as stf :
         print(row("")+"  tp\t  fp\t  fn\t#pred\t#exp\tP\tR\tF1", file=stf)
         print("------------------------------------------------------------------------------", file=stf)
-        (nk,sP,sR,sF1) = (0,0,0,0)
         for kind in sorted(gold) :
             if kind=="CLASS" or kind=="NOCLASS" : continue
             (tp,fp,fn,npred,nexp,P,R,F1) = statistics(gold, predicted, kind)
             print(row(kind)+"{:>4}\t{:>4}\t{:>4}\t{:>4}\t{:>4}\t{:2.1%}\t{:2.1%}\t{:2.1%}".format(tp,fp,fn,npred,nexp, P, R, F1), file=stf)
-            (nk,sP,sR,sF1) = (nk+1, sP+P, sR+R, sF1+F1)
 
-        (sP, sR, sF1) = (sP/nk, sR/nk, sF1/nk)
+        (sP, sR, sF1) = averages(gold, predicted)["M.avg"]
         print("------------------------------------------------------------------------------", file=stf)
         print(row("M.avg")+"-\t-\t-\t-\t-\t{:2.1%}\t{:2.1%}\t{:2.1%}".format(sP, sR, sF1), file=stf)
 
@@ -149,10 +146,29 @@ def print_statistics(gold, predicted, statsfile) :
         (tp,fp,fn,npred,nexp,P,R,F1) = statistics(gold, predicted, "NOCLASS")
         print(row("m.avg(no class)")+"{:>4}\t{:>4}\t{:>4}\t{:>4}\t{:>4}\t{:2.1%}\t{:2.1%}\t{:2.1%}".format(tp,fp,fn,npred,nexp, P, R, F1), file=stf)  
 
+## --
+## -- Compute macro and micro averages, as a dictionary
+## --   {"M.avg" : (P,R,F1), "m.avg" : (P,R,F1), "m.avg(no class)" : (P,R,F1)}
+## -- Macro averages are 0 if there are no classes in gold.
+## --
+
+def averages(gold, predicted) :
+    (nk,sP,sR,sF1) = (0,0,0,0)
+    for kind in gold :
+        if kind=="CLASS" or kind=="NOCLASS" : continue
+        (tp,fp,fn,npred,nexp,P,R,F1) = statistics(gold, predicted, kind)
+        (nk,sP,sR,sF1) = (nk+1, sP+P, sR+R, sF1+F1)
+
+    avgs = {"M.avg" : (sP/nk, sR/nk, sF1/nk) if nk > 0 else (0,0,0)}
+    avgs["m.avg"] = statistics(gold, predicted, "CLASS")[5:]
+    avgs["m.avg(no class)"] = statistics(gold, predicted, "NOCLASS")[5:]
+    return avgs
+
 ## --
 ## -- Evaluates results in outfile comparing them with gold standard in goldfile.
 ## -- 'task' is either NER or DDI
 ## -- This function can be called from any program requesting evaluation.
+## -- Returns the averages written to statsfile (see averages above).
 ## --
  
 def evaluate(task, goldfile, predfile, statsfile):
@@ -172,6 +188,7 @@ def evaluate(task, goldfile, predfile, statsfile):
 
     # compare both sets and compute statistics
     print_statistics(gold, predicted, statsfile)
+    return averages(gold, predicted)
          
         
 ## --
@@ -0,0 +1,195 @@
+#! /usr/bin/python3
+
+# Binary format for featurized corpora (replaces tab-separated .feat files).
+#
+# A feature file holds a sequence of rows (one per token for NER, one per
+# entity pair for DDI), each with some information fields (e.g. sentence
+# id, token form and offsets, gold label) and a list of string features.
+# Rows may be grouped (e.g. tokens in the same sentence).
+#
+# All strings are interned, and the file stores (see arrayfile.py):
+#   - strings: table of information field values
+#   - features: table of feature names. Feature ids are given by order of
+#               first appearance in the file, so they can be directly used
+#               as feature index (column number) for that file
+#   - info[r,k]: id in strings of the value of field k for row r
+#   - feat_ptr, feat_ids: features of row r are
+#               feat_ids[feat_ptr[r]:feat_ptr[r+1]]
+#   - group_ptr: rows of group g are group_ptr[g]..group_ptr[g+1]-1
+#
+# Arrays are memory-mapped when the file is loaded.
+#
+# Usage:
+#    fw = FeatWriter(fname, ["sid","form","start","end","tag"])
+#    fw.add(["d1.s0","Aspirin","0","6","B-drug"], ["form=Aspirin","suf3=rin"])
+#    fw.end_group()
+#    fw.close()
+#
+#    ff = FeatFile(fname)
+#    for start,end in ff.groups() :
+#       for r in range(start,end) : ff.row_info(r), ff.row_features(r)
+#
+# As standalone program, converts old tab-separated .feat files:
+#    featfile.py (NER|DDI) old.feat new.feat
+
+import sys
+from array import array
+import numpy as np
+
+import arrayfile
+
+# fields and layout of the tab-separated files for each task:
+#   (fields, rows are grouped in blank-line separated sentences)
+FORMATS = {"NER" : (["sid","form","start","end","tag"], True),
+           "DDI" : (["sid","e1","e2","label"], False)}
+
+
+## --
+## -- check whether given file is in binary feature format
+## --
+
+def is_featfile(filename) :
+    with open(filename, "rb") as f :
+        return f.read(len(arrayfile.MAGIC)) == arrayfile.MAGIC
+
+
+class FeatWriter :
+
+    ## --------------------------------------------------
+    ## Constructor: create feature file with given info fields
+    ## --------------------------------------------------
+    def __init__(self, filename, fields) :
+        self.filename = filename
+        self.fields = list(fields)
+        self.string_id = {}
+        self.feature_id = {}
+        self.info = array("i")
+        self.feat_ptr = array("q", [0])
+        self.feat_ids = array("i")
+        self.group_ptr = array("q", [0])
+
+    ## --------------------------------------------------
+    ## add a row with given info field values and features
+    ## --------------------------------------------------
+    def add(self, info, features) :
+        sid, fid = self.string_id, self.feature_id
+        for x in info :
+            i = sid.get(x)
+            if i is None : i = sid[x] = len(sid)
+            self.info.append(i)
+        for f in features :
+            i = fid.get(f)
+            if i is None : i = fid[f] = len(fid)
+            self.feat_ids.append(i)
+        self.feat_ptr.append(len(self.feat_ids))
+
+    ## --------------------------------------------------
+    ## close current group of rows
+    ## --------------------------------------------------
+    def end_group(self) :
+        self.group_ptr.append(len(self.feat_ptr)-1)
+
+    ## --------------------------------------------------
+    ## write file to disk
+    ## --------------------------------------------------
+    def close(self) :
+        # rows after last group end form a group of their own
+        if self.group_ptr[-1] != len(self.feat_ptr)-1 : self.end_group()
+
+        str_data, str_offsets = arrayfile.pack_strings(self.string_id)
+        feat_data, feat_offsets = arrayfile.pack_strings(self.feature_id)
+        arrayfile.save(self.filename,
+                       {"str_data" : str_data,
+                        "str_offsets" : str_offsets,
+                        "feat_data" : feat_data,
+                        "feat_offsets" : feat_offsets,
+                        "info" : np.frombuffer(self.info, dtype=np.int32).reshape(-1, len(self.fields)),
+                        "feat_ptr" : np.frombuffer(self.feat_ptr, dtype=np.int64),
+                        "feat_ids" : np.frombuffer(self.feat_ids, dtype=np.int32),
+                        "group_ptr" : np.frombuffer(self.group_ptr, dtype=np.int64)},
+                       meta = {"fields" : self.fields})
+
+
+class FeatFile :
+
+    ## --------------------------------------------------
+    ## Constructor: load (memory-map) given feature file
+    ## --------------------------------------------------
+    def __init__(self, filename) :
+        arrays, meta = arrayfile.load(filename)
+        self.fields = meta["fields"]
+        self.strings = arrayfile.unpack_strings(arrays["str_data"], arrays["str_offsets"])
+        self.features = arrayfile.unpack_strings(arrays["feat_data"], arrays["feat_offsets"])
+        self.info = arrays["info"]
+        self.feat_ptr = arrays["feat_ptr"]
+        self.feat_ids = arrays["feat_ids"]
+        self.group_ptr = arrays["group_ptr"]
+
+    ## --------------------------------------------------
+    ## number of rows in the file
+    ## --------------------------------------------------
+    def n_rows(self) :
+        return len(self.feat_ptr)-1
+
+    ## --------------------------------------------------
+    ## values of all info fields for row r, as a list of strings
+    ## --------------------------------------------------
+    def row_info(self, r) :
+        return [self.strings[i] for i in self.info[r].tolist()]
+
+    ## --------------------------------------------------
+    ## values of given info field for all rows, as a list of strings
+    ## --------------------------------------------------
+    def column(self, field) :
+        k = self.fields.index(field)
+        return [self.strings[i] for i in self.info[:,k].tolist()]
+
+    ## --------------------------------------------------
+    ## feature ids for row r
+    ## --------------------------------------------------
+    def row_feature_ids(self, r) :
+        return self.feat_ids[self.feat_ptr[r]:self.feat_ptr[r+1]]
+
+    ## --------------------------------------------------
+    ## features for row r, as a list of strings
+    ## --------------------------------------------------
+    def row_features(self, r) :
+        return [self.features[i] for i in self.row_feature_ids(r).tolist()]
+
+    ## --------------------------------------------------
+    ## iterator over (start,end) row ranges of each group
+    ## --------------------------------------------------
+    def groups(self) :
+        ptr = self.group_ptr.tolist()
+        for g in range(len(ptr)-1) :
+            yield ptr[g], ptr[g+1]
+
+
+## --
+## -- convert an old tab-separated .feat file for given task to binary format
+## --
+
+def convert(task, infile, outfile) :
+    fields, grouped = FORMATS[task]
+    nf = len(fields)
+    fw = FeatWriter(outfile, fields)
+    with open(infile) as fi :
+        for line in fi :
+            if grouped :
+                line = line.strip('\n')
+                if not line :
+                    fw.end_group()
+                    continue
+                items = line.split('\t')
+            else :
+                items = line.strip().split()
+                if not items : continue
+            fw.add(items[:nf], items[nf:])
+    fw.close()
+
+
+if __name__ == "__main__" :
+    if len(sys.argv) != 4 or sys.argv[1] not in FORMATS :
+        print(f"usage:  featfile.py (NER|DDI) old.feat new.feat")
+        sys.exit(1)
+    convert(*sys.argv[1:])
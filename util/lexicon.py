@@ -0,0 +1,286 @@
+
+# Lexicon of known drug names, compiled from the resource files and
+# shared by all stages.
+#
+# Resource files (HSDB.txt, DrugBank.txt, drugs-train.txt) are parsed
+# once, and the result is stored in the project "cache" directory:
+#
+#   - <name>.<digest>.pck : dictionaries "external" (full name -> set of
+#             types) and "externalpart" (token in a multi-token name ->
+#             set of types)
+#   - <name>.<digest>.trie : token-level prefix tree with all names, where
+#             names are split on whitespace (see token_trie.py). Built only
+#             when first requested
+#   - <name>.sections.pck : the same information for each resource file
+#             separately, tagged with its hash, so when a resource file
+#             changes only that file needs to be parsed again.
+#
+# <name> identifies the lexicon configuration (sources, type given to HSDB
+# entries, and tokenizer used to split names into parts), and <digest> is
+# computed from the format VERSION and the hashes of the resource files, so
+# compiled files are rebuilt when the format or any resource file changes.
+# Everything is loaded lazily, the first time it is used.
+#
+# Usage:
+#    lex = Lexicon(sources=["HSDB.txt","DrugBank.txt"], hsdb_type="any")
+#    found, types = lex.find("aspirin", "external")
+#    trie = lex.trie
+
+import os, sys
+import glob
+import hashlib
+import pickle
+from itertools import chain
+from multiprocessing import Pool
+
+from token_trie import TokenTrie
+
+# folder where this file is located, and main project folder one level up
+UTILDIR = os.path.abspath(os.path.dirname(__file__))
+MAINDIR = os.path.dirname(UTILDIR)
+RESOURCESDIR = os.path.join(MAINDIR, "resources")
+# default location for compiled lexicons
+CACHEDIR = os.path.join(MAINDIR, "cache", "lexicon")
+
+# format version of compiled files. Increase when it changes.
+VERSION = 1
+
+# how to get (name, type) from each line of known resource files.
+# HSDB entries have no type, it is given by the lexicon configuration.
+# All names are stripped and lowercased before being split into parts.
+# (Older dictionaries tokenized HSDB lines as they were, so their
+# "externalpart" keys kept the original case, plus the newline, and
+# never matched lowercase lookups.)
+READERS = {"HSDB.txt" : lambda x : (x.strip().lower(), None),
+           "DrugBank.txt" : lambda x : tuple(x.strip().lower().split("|")),
+           "drugs-train.txt" : lambda x : tuple(x.strip().lower().split("|")[2:]),
+          }
+ALL_SOURCES = list(READERS)
+
+# number of names sent to each tokenizer process at once
+CHUNK = 2000
+
+## --
+## -- tokenizer used by each worker process when names are split with spaCy.
+## -- Only tokenization is needed, so a blank English pipeline is used
+## -- (same tokenizer as en_core_web_trf)
+## --
+_tokenizer = None
+
+def _init_worker() :
+    global _tokenizer
+    import spacy
+    _tokenizer = spacy.blank("en").tokenizer
+
+def _tokenize(names) :
+    return [[tk.text for tk in doc] for doc in _tokenizer.pipe(names)]
+
+
+class Lexicon :
+
+    ## --------------------------------------------------
+    ## Constructor.
+    ##   - sources: resource files to include, in order. If a name appears
+    ##              in several, all its types are kept in the dictionaries,
+    ##              and the last one in the trie.
+    ##   - hsdb_type: type given to HSDB entries
+    ##   - tokenizer: how to split names into parts for "externalpart":
+    ##              "split" (on whitespace) or "spacy" (spaCy tokenizer,
+    ##              run in 'n_process' processes)
+    ## --------------------------------------------------
+    def __init__(self, sources=ALL_SOURCES, hsdb_type="drug", tokenizer="split",
+                 resources=RESOURCESDIR, cachedir=CACHEDIR, n_process=None) :
+        if tokenizer not in ["split", "spacy"] :
+            raise ValueError(f"Unknown lexicon tokenizer '{tokenizer}'")
+
+        self.sources = list(sources)
+        self.hsdb_type = hsdb_type
+        self.tokenizer = tokenizer
+        self.resources = resources
+        self.cachedir = cachedir
+        self.n_process = n_process
+
+        name = "+".join(os.path.splitext(s)[0] for s in self.sources)
+        self.basename = os.path.join(cachedir, f"{name}.{hsdb_type}.{tokenizer}")
+
+        self.__digest = None
+        self.__data = None  # loaded only when needed
+
+    ## --------------------------------------------------
+    ## hash of each resource file contents
+    ## --------------------------------------------------
+    def __hashes(self) :
+        hashes = {}
+        for src in self.sources :
+            with open(os.path.join(self.resources, src), "rb") as f :
+                hashes[src] = hashlib.sha1(f.read()).hexdigest()
+        return hashes
+
+    ## --------------------------------------------------
+    ## identifier for current resources and format version
+    ## --------------------------------------------------
+    def __get_digest(self) :
+        if self.__digest is None :
+            hashes = self.__hashes()
+            key = f"{VERSION}|" + "|".join(src+":"+hashes[src] for src in self.sources)
+            self.__digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        return self.__digest
+
+    ## --------------------------------------------------
+    ## identifier of the lexicon contents: configuration, format version,
+    ## and resource files. It changes whenever any of them does.
+    ## --------------------------------------------------
+    @property
+    def digest(self) :
+        return os.path.basename(self.basename) + "." + self.__get_digest()
+
+    ## --------------------------------------------------
+    ## write given object to a pickle file, through a temporary file
+    ## so an interrupted run never leaves a broken file behind
+    ## --------------------------------------------------
+    def __dump(self, obj, fname) :
+        os.makedirs(self.cachedir, exist_ok=True)
+        with open(fname+".tmp", "wb") as f :
+            pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(fname+".tmp", fname)
+
+    ## --------------------------------------------------
+    ## remove compiled files for older versions of the resources
+    ## --------------------------------------------------
+    def __remove_stale(self, suffix) :
+        current = f"{self.basename}.{self.__get_digest()}.{suffix}"
+        for fname in glob.glob(glob.escape(self.basename) + ".*." + suffix) :
+            if fname != current and not fname.endswith(".sections.pck") :
+                os.remove(fname)
+
+    ## --------------------------------------------------
+    ## parse one resource file, returning its entries
+    ## --------------------------------------------------
+    def __build_section(self, src, pool) :
+        with open(os.path.join(self.resources, src), encoding="utf-8") as h :
+            names = []
+            for x in h :
+                if not x.strip() : continue
+                n,t = READERS[src](x)
+                names.append((n, t if t is not None else self.hsdb_type))
+
+        if self.tokenizer == "spacy" :
+            chunks = [[n for n,t in names[i:i+CHUNK]] for i in range(0, len(names), CHUNK)]
+            tokenized = chain.from_iterable(pool.imap(_tokenize, chunks))
+        else :
+            tokenized = (n.split() for n,t in names)
+
+        external = {}
+        externalpart = {}
+        for (n,t), wds in zip(names, tokenized) :
+            external.setdefault(n, set()).add(t)
+            if len(wds)>1 :
+                for w in wds :
+                    externalpart.setdefault(w, set()).add(t)
+
+        return {"external" : external, "externalpart" : externalpart, "names" : names}
+
+    ## --------------------------------------------------
+    ## get entries for each resource file, parsing only those that
+    ## changed since last compilation
+    ## --------------------------------------------------
+    def __sections(self) :
+        fname = self.basename + ".sections.pck"
+        previous = {}
+        if os.path.exists(fname) :
+            with open(fname, "rb") as f :
+                previous = pickle.load(f)
+            if previous.get("version") != VERSION : previous = {}
+
+        sections = {"version" : VERSION}
+        changed = False
+        pool = None
+        for src,sha1 in self.__hashes().items() :
+            if src in previous and previous[src]["sha1"] == sha1 :
+                sections[src] = previous[src]
+            else :
+                print(f"Lexicon: processing {src}")
+                if pool is None and self.tokenizer == "spacy" :
+                    pool = Pool(self.n_process, initializer=_init_worker)
+                sections[src] = self.__build_section(src, pool)
+                sections[src]["sha1"] = sha1
+                changed = True
+
+        if pool is not None :
+            pool.close()
+            pool.join()
+        if changed : self.__dump(sections, fname)
+
+        return [sections[src] for src in self.sources]
+
+    ## --------------------------------------------------
+    ## compile dictionaries if needed, and load them
+    ## --------------------------------------------------
+    def compile(self) :
+        if self.__data is not None : return
+
+        fname = f"{self.basename}.{self.__get_digest()}.pck"
+        if os.path.exists(fname) :
+            with open(fname, "rb") as f :
+                self.__data = pickle.load(f)
+            return
+
+        print(f"Lexicon: compiling {os.path.basename(self.basename)}")
+        data = {"external" : {}, "externalpart" : {}}
+        for sec in self.__sections() :
+            for d in data :
+                for x,v in sec[d].items() :
+                    data[d].setdefault(x, set()).update(v)
+        self.__dump(data, fname)
+        self.__remove_stale("pck")
+        self.__data = data
+
+    ## --------------------------------------------------
+    ## full name -> set of types
+    ## --------------------------------------------------
+    @property
+    def external(self) :
+        self.compile()
+        return self.__data["external"]
+
+    ## --------------------------------------------------
+    ## part of a multi-token name -> set of types
+    ## --------------------------------------------------
+    @property
+    def externalpart(self) :
+        self.compile()
+        return self.__data["externalpart"]
+
+    ## --------------------------------------------------
+    ## find entry in given section ("external" or "externalpart")
+    ## --------------------------------------------------
+    def find(self, txt, section) :
+        d = self.external if section == "external" else self.externalpart
+        if txt in d :
+            return True, d[txt]
+        else :
+            return False, None
+
+    ## --------------------------------------------------
+    ## file with the compiled trie, creating it if needed
+    ## --------------------------------------------------
+    def trie_file(self) :
+        fname = f"{self.basename}.{self.__get_digest()}.trie"
+        if not os.path.exists(fname) :
+            print(f"Lexicon: compiling {os.path.basename(self.basename)} trie")
+            names = ((n.split(), t) for sec in self.__sections() for n,t in sec["names"])
+            trie = TokenTrie()
+            trie.compile(trie.build_tree(names))
+            os.makedirs(self.cachedir, exist_ok=True)
+            trie.save(fname+".tmp")
+            os.replace(fname+".tmp", fname)
+            self.__remove_stale("trie")
+        return fname
+
+    ## --------------------------------------------------
+    ## token-level prefix tree with all names
+    ## --------------------------------------------------
+    @property
+    def trie(self) :
+        return TokenTrie(self.trie_file())
+
@@ -0,0 +1,138 @@
+
+# Compact file format for linear classifiers (e.g. sklearn LogisticRegression
+# or LinearSVC), and a scorer that needs only NumPy/SciPy to use them.
+#
+# The file stores (see arrayfile.py):
+#   - classes: label names (packed strings)
+#   - weights[i,k]: weight of feature i for class k (float32). If there are
+#                   only two classes there is a single column, and positive
+#                   scores mean the second class, as in sklearn.
+#   - bias[k]: intercept for class k
+#   - keys: sorted 64-bit hashes of the feature names. Feature with hash
+#           keys[i] has weights in row i. Features are looked up with a
+#           binary search over all features in a batch at once.
+# For models on hashed features (see dataset.feature_hasher), there are
+# no keys, the hasher settings are kept in the metadata instead.
+#
+# Arrays are memory-mapped when the file is loaded, so loading takes
+# milliseconds and processes using the same model share its pages.
+#
+# Usage:
+#    linear_model.save(fname, clf.classes_, clf.coef_, clf.intercept_, fidx)
+#    model = LinearModel(fname)
+#    model.predict(model.transform([["form=aspirin","suf3=rin"], ...]))
+
+import hashlib
+import numpy as np
+import scipy.sparse
+
+import arrayfile
+
+VERSION = 1
+
+
+## --
+## -- check whether given file is a compact linear model
+## --
+
+def is_linear_model(filename) :
+    with open(filename, "rb") as f :
+        if f.read(len(arrayfile.MAGIC)) != arrayfile.MAGIC : return False
+    return arrayfile.load(filename)[1].get("kind") == "linear"
+
+
+## --
+## -- 64-bit hashes of given feature names, as a uint64 array
+## --
+
+def feature_hashes(features, count=-1) :
+    return np.fromiter((int.from_bytes(hashlib.blake2b(f.encode("utf-8"), digest_size=8).digest(), "little")
+                        for f in features),
+                       dtype=np.uint64, count=count)
+
+
+## --
+## -- save a linear model. coef/intercept are as in sklearn (one row per
+## -- class, or a single one for two classes), 'fidx' is the feature index
+## -- used to train it: a dictionary feature->column, or a FeatureHasher.
+## --
+
+def save(filename, classes, coef, intercept, fidx) :
+    weights = np.asarray(coef, dtype=np.float32).T
+    meta = {"kind" : "linear", "version" : VERSION}
+    arrays = {"bias" : np.asarray(intercept, dtype=np.float32)}
+    arrays["class_data"], arrays["class_offsets"] = arrayfile.pack_strings([str(c) for c in classes])
+
+    if isinstance(fidx, dict) :
+        features = list(fidx)
+        keys = feature_hashes(features, len(features))
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        if len(keys)>1 and (keys[1:]==keys[:-1]).any() :
+            raise ValueError("Feature hash collision, model can not be saved")
+        cols = np.fromiter((fidx[f] for f in features), dtype=np.int64, count=len(features))
+        arrays["keys"] = keys
+        arrays["weights"] = weights[cols[order]]
+    else :
+        meta["hasher"] = {"n_features" : fidx.n_features,
+                          "alternate_sign" : fidx.alternate_sign}
+        arrays["weights"] = weights
+
+    arrayfile.save(filename, arrays, meta)
+
+
+class LinearModel :
+
+    ## --------------------------------------------------
+    ## Constructor: load (memory-map) given model file
+    ## --------------------------------------------------
+    def __init__(self, filename) :
+        arrays, meta = arrayfile.load(filename)
+        self.classes = np.array(arrayfile.unpack_strings(arrays["class_data"], arrays["class_offsets"]))
+        self.weights = arrays["weights"]
+        self.bias = arrays["bias"]
+        self.keys = arrays.get("keys")
+        self.hasher = None
+        if "hasher" in meta :
+            # only models on hashed features need sklearn
+            from sklearn.feature_extraction import FeatureHasher
+            self.hasher = FeatureHasher(input_type="string", **meta["hasher"])
+
+    ## --------------------------------------------------
+    ## encode examples (each a list of string features) as a sparse
+    ## matrix with one column per model feature. Unknown features are
+    ## ignored.
+    ## --------------------------------------------------
+    def transform(self, examples) :
+        if self.hasher is not None :
+            return self.hasher.transform(examples)
+
+        n = len(examples)
+        lens = np.fromiter((len(w) for w in examples), dtype=np.int64, count=n)
+        hashes = feature_hashes((f for w in examples for f in w), int(lens.sum()))
+        # find position of each feature in model keys
+        pos = np.searchsorted(self.keys, hashes)
+        found = pos < len(self.keys)
+        found[found] = self.keys[pos[found]] == hashes[found]
+        # count known features in each example
+        rows = np.repeat(np.arange(n), lens)[found]
+        indptr = np.zeros(n+1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+
+        data = np.ones(len(rows), dtype=np.int8)
+        return scipy.sparse.csr_matrix((data, pos[found], indptr), shape=(n, len(self.keys)))
+
+    ## --------------------------------------------------
+    ## scores of each class for each row in X
+    ## --------------------------------------------------
+    def decision_function(self, X) :
+        return X @ self.weights + self.bias
+
+    ## --------------------------------------------------
+    ## best class for each row in X
+    ## --------------------------------------------------
+    def predict(self, X) :
+        scores = self.decision_function(X)
+        if scores.shape[1] == 1 :
+            return self.classes[(scores[:,0] > 0).astype(np.int64)]
+        return self.classes[scores.argmax(axis=1)]
@@ -0,0 +1,196 @@
+
+# Prefix tree of names, at token level, compiled into flat arrays.
+#
+#   - tokens: table of all known tokens, interned to integer ids
+#             (ids follow alphabetical order)
+#   - node_kind[n]: index in self.kinds of the type of the name ending
+#                   at node n, or -1 if no name ends there
+#   - child_ptr, child_tok, child_node: children of node n are stored in
+#            positions child_ptr[n]..child_ptr[n+1]-1 of child_tok (token id
+#            labeling the edge, sorted) and child_node (target node).
+#            Node 0 is the root.
+#
+# The arrays are saved in a binary file (see arrayfile.py) that is
+# memory-mapped when loaded.
+#
+# Usage:
+#    trie = TokenTrie()
+#    trie.compile(trie.build_tree([(["mitomycin","c"], "drug"), ...]))
+#    trie.save(fname)
+#    ...
+#    trie = TokenTrie(fname)
+#    trie.match_all(["Mitomycin", "C", "and", ...])  # [(0, 1, "drug")]
+
+from bisect import bisect_left
+import numpy as np
+
+import arrayfile
+
+
+class TokenTrie() :
+    def __init__(self, filename=None) :
+        if filename is not None :
+            self.load(filename)
+
+    # ------------------------------------------
+    # build a tree of nested dictionaries from (tokens, type) pairs.
+    # If a name appears more than once, the last type is kept
+    def build_tree(self, names) :
+        tree = {}
+        for tks, kind in names :
+            if tks : self.add_drug(tree, tks, kind)
+        return tree
+
+    # ------------------------------------------
+    def add_drug(self, node, tks, kind) :
+        if tks[0] not in node :
+            node[tks[0]] = {}
+
+        if len(tks)==1 :
+            node[tks[0]]["END"] = kind
+        else :
+            self.add_drug(node[tks[0]], tks[1:], kind)
+
+    # ------------------------------------------
+    # convert a tree of nested dictionaries into flat arrays
+    def compile(self, tree) :
+        # intern tokens and name types
+        tokens = set()
+        kinds = set()
+        stack = [tree]
+        while stack :
+            node = stack.pop()
+            for k,v in node.items() :
+                if k == "END" : kinds.add(v)
+                else :
+                    tokens.add(k)
+                    stack.append(v)
+        self.tokens = sorted(tokens)
+        self.token_id = {t:i for i,t in enumerate(self.tokens)}
+        self.kinds = sorted(kinds)
+        kind_id = {k:i for i,k in enumerate(self.kinds)}
+
+        # number nodes in breadth-first order, storing children of
+        # each node contiguously
+        nodes = [tree]
+        node_kind = []
+        child_ptr = [0]
+        child_tok = []
+        child_node = []
+        n = 0
+        while n < len(nodes) :
+            node = nodes[n]
+            node_kind.append(kind_id[node["END"]] if "END" in node else -1)
+            for t in sorted(k for k in node if k != "END") :
+                child_tok.append(self.token_id[t])
+                child_node.append(len(nodes))
+                nodes.append(node[t])
+            child_ptr.append(len(child_tok))
+            n += 1
+
+        self.node_kind = np.array(node_kind, dtype=np.int8)
+        self.child_ptr = np.array(child_ptr, dtype=np.int32)
+        self.child_tok = np.array(child_tok, dtype=np.int32)
+        self.child_node = np.array(child_node, dtype=np.int32)
+        self.__make_views()
+
+    # ------------------------------------------
+    def save(self, filename) :
+        tok_data, tok_offsets = arrayfile.pack_strings(self.tokens)
+        arrayfile.save(filename,
+                       {"tok_data" : tok_data,
+                        "tok_offsets" : tok_offsets,
+                        "node_kind" : self.node_kind,
+                        "child_ptr" : self.child_ptr,
+                        "child_tok" : self.child_tok,
+                        "child_node" : self.child_node},
+                       meta = {"kinds" : self.kinds})
+
+    # ------------------------------------------
+    def load(self, filename) :
+        arrays, meta = arrayfile.load(filename)
+        self.tokens = arrayfile.unpack_strings(arrays["tok_data"], arrays["tok_offsets"])
+        self.token_id = {t:i for i,t in enumerate(self.tokens)}
+        self.kinds = meta["kinds"]
+        self.node_kind = arrays["node_kind"]
+        self.child_ptr = arrays["child_ptr"]
+        self.child_tok = arrays["child_tok"]
+        self.child_node = arrays["child_node"]
+        self.__make_views()
+
+    # ------------------------------------------
+    # memory views on the arrays, which give plain integers
+    # when indexed, much faster than NumPy scalars for the
+    # node-by-node lookups in the trie
+    def __make_views(self) :
+        self.__kind = memoryview(self.node_kind)
+        self.__ptr = memoryview(self.child_ptr)
+        self.__tok = memoryview(self.child_tok)
+        self.__node = memoryview(self.child_node)
+
+    # ------------------------------------------
+    # return node reached from given node following token id tok, or -1
+    def child(self, node, tok) :
+        hi = self.__ptr[node+1]
+        j = bisect_left(self.__tok, tok, self.__ptr[node], hi)
+        if j < hi and self.__tok[j] == tok :
+            return self.__node[j]
+        return -1
+
+    # ------------------------------------------
+    # longest name in index starting at position i of given list
+    # of token ids (-1 for unknown tokens). Returns kind id and end
+    # position of the name, or (-1,0) if not found
+    def __longest(self, ids, i) :
+        kind, end = -1, 0
+        node = 0
+        for j in range(i, len(ids)) :
+            if ids[j] < 0 : break
+            node = self.child(node, ids[j])
+            if node < 0 : break
+            if self.__kind[node] >= 0 :
+                kind, end = self.__kind[node], j
+
+        return kind, end
+
+    # ------------------------------------------
+    # convert list of strings to token ids, lowercasing them
+    def __intern(self, forms) :
+        return [self.token_id.get(f.lower(), -1) for f in forms]
+
+    # ------------------------------------------
+    # find all leftmost-longest names in given list of strings,
+    # scanning it once. Returns a list of (start, end, type) tuples,
+    # with 'end' the position of the last token in the name.
+    def match_all(self, forms) :
+        ids = self.__intern(forms)
+        matches = []
+        i = 0
+        while i < len(ids) :
+            kind, end = self.__longest(ids, i)
+            if kind >= 0 :
+                matches.append((i, end, self.kinds[kind]))
+                i = end
+            i += 1
+        return matches
+
+    # ------------------------------------------
+    # longest name in index starting at position i of given
+    # list of strings. Returns type and end position of the name,
+    # or (None,0) if not found
+    def search_drug(self, tks, i) :
+        kind, end = self.__longest(self.__intern(tks), i)
+        if kind < 0 : return None, 0
+        return self.kinds[kind], end
+
+    # ------------------------------------------
+    # iterate over all names in the index, as (tokens, type) pairs
+    def names(self) :
+        stack = [(0, [])]
+        while stack :
+            node, tks = stack.pop()
+            if self.__kind[node] >= 0 :
+                yield tks, self.kinds[self.__kind[node]]
+            for j in range(self.__ptr[node], self.__ptr[node+1]) :
+                stack.append((self.__node[j], tks + [self.tokens[self.__tok[j]]]))
+
@@ -5,29 +5,26 @@
 # May be useful to compare with your output or to perform data exploration
 import sys
 import json
-from xml.dom.minidom import parse
+import corpus
 
 class DataFormatter() :
 
     def __init__(self, datafile) :
-       self.tree =  parse(datafile)   
+       self.datafile = datafile
     
     def extract_NER(self, outfile) :
        dataset = []
        # process each sentence in the file
-       sentences = self.tree.getElementsByTagName("sentence")
-       for s in sentences :
-          sid = s.attributes["id"].value   # get sentence id
+       for s in corpus.sentences(self.datafile) :
+          sid = s["id"]   # get sentence id
           print(f"extracting sentence {sid}        \r", end="", file=sys.stderr)
-          stext = s.attributes["text"].value.strip()   # get sentence text
-          entities = s.getElementsByTagName("entity") # get gold standard entities
+          stext = s["text"].strip()   # get sentence text
           spans = []
-          for e in entities :
+          for e in s["entities"] :
              # for discontinuous entities, we only get the first span
              # (will not work, but there are few of them)
-             (start,end) = e.attributes["charOffset"].value.split(";")[0].split("-")
-             typ =  e.attributes["type"].value
-             spans.append((int(start),int(end),typ)) 
+             (start,end) = e["spans"][0]
+             spans.append((start,end,e["type"])) 
           # start with the last span
           spans.sort(reverse=True)
 
@@ -49,27 +46,22 @@ class DataFormatter() :
     def extract_DDI(self, outfile) :
        dataset = []
        # process each sentence in the file
-       sentences = self.tree.getElementsByTagName("sentence")
-       for s in sentences :
-          sid = s.attributes["id"].value   # get sentence id
+       for s in corpus.sentences(self.datafile) :
+          sid = s["id"]   # get sentence id
           print(f"extracting sentence {sid}        \r", end="", file=sys.stderr)
-          stext = s.attributes["text"].value.strip()   # get sentence text
-          entities = s.getElementsByTagName("entity") # get gold standard entities
+          stext = s["text"].strip()   # get sentence text
           ents = {}
-          for e in entities :
+          for e in s["entities"] :
              # for discontinuous entities, we only get the first span
              # (will not work, but there are few of them)
-             (start,end) = e.attributes["charOffset"].value.split(";")[0].split("-")
-             typ = e.attributes["type"].value
-             eid = e.attributes["id"].value
-             ents[eid] = {"type" : typ, "start" : int(start), "end" : int(end) }
+             (start,end) = e["spans"][0]
+             ents[e["id"]] = {"type" : e["type"], "start" : start, "end" : end }
 
-          pairs = s.getElementsByTagName("pair")
-          for p in pairs :
-             pid = p.attributes["id"].value
-             ddi = p.attributes["type"].value if p.attributes["ddi"].value=="true" else "none"
-             e1 = ents[p.attributes["e1"].value]
-             e2 = ents[p.attributes["e2"].value]
+          for p in s["pairs"] :
+             pid = p["id"]
+             ddi = p["type"] if p["ddi"] else "none"
+             e1 = ents[p["e1"]]
+             e2 = ents[p["e2"]]
                      
              newtext = stext
              newtext = newtext[:e2["end"]+1] + f'</drug2>' + newtext[e2["end"]+1:]